@@ -1,19 +1,147 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import random
 import time
-import plotly.graph_objects as go
-from scipy.optimize import curve_fit
-from snowflake.snowpark.context import get_active_session
+import cProfile
+import logging
+from contextlib import contextmanager
+from datetime import date
+from functools import partial
+from analytics.export import FORMATS, MIME_TYPES, export_bytes, frame_chunks
+from analytics.instrumentation import StageTimer, count, counters, profile_bytes
+from analytics.intraday import IntradayUpdater, intraday_feed_from_env
+from analytics.loaders import SnowparkBackend, SourceLoader, backend_from_env
+from analytics.nelson_siegel import curve_grid, ticker_params
+from analytics.paging import PAGE_SIZES, page_table
+from analytics.parallel import executor_from_env
+from analytics.param_store import param_store_from_env
+from analytics.peers import (MIN_PEERS, available_peer_keys, history_zscores, peer_history_from_env,
+                             peer_zscores)
+from analytics.pipeline import precomputed_store_from_env
+from analytics.processing import HY_DEVIATION_THRESHOLD, IG_DEVIATION_THRESHOLD
+from analytics.signals import (ig_pairs, ig_trade_table, hy_pairs, hy_trade_table, IG_RATIO_CUTOFF, HY_RATIO_CUTOFF,
+                               IG_THRESHOLD_RANGE, RATIO_CUTOFF_FLOOR)
+from analytics.snapshot import OwnershipCache, SnapshotStore, build_snapshot
 
 
 st.set_page_config(page_title="Multi-Page App", layout="wide")
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s %(message)s')
+
+# "Auto" scatter rendering draws issuers with at least this many bonds with WebGL.
+SCATTERGL_MIN_POINTS = 300
 
 # Sidebar navigation
 st.sidebar.title("Navigation")
 page = st.sidebar.selectbox("Select a page", ["Home", "Curve", "Fundamental", "Z-Score of Peers"])
 
+# Diagnostics: per-stage timings, cache counters and an opt-in cProfile of one rerun,
+# on the pages that use the analytics snapshot
+show_diagnostics = page in ("Curve", "Z-Score of Peers") and st.sidebar.checkbox("Show diagnostics")
+profile_rerun = show_diagnostics and st.sidebar.checkbox("Profile this rerun (cProfile)")
+
+# --- Shared Analytics Snapshot ---
+# One store per server process: built once, refreshed in the background and
+# swapped in atomically, so a rerun only slices and renders.  NS_APP_PRECOMPUTED_DIR
+# serves the output of `python -m analytics.pipeline` instead; otherwise sources load
+# through Snowpark unless NS_APP_DATA_DIR points at a local Parquet/SQLite copy.
+# NS_APP_PARAM_STORE keeps a fit history so refits warm-start from yesterday, and
+# NS_APP_PEER_HISTORY the daily history behind the peer z-scores.  NS_APP_INTRADAY_FEED
+# names a CSV of (CUSIP, OAS_BP, DURADJMOD) updates that is patched into the snapshot.
+# NS_APP_WORKERS fits and scans snapshot builds on that many processes.
+@st.cache_resource
+def get_param_store():
+    return param_store_from_env()
+
+@st.cache_resource
+def get_executor():
+    return executor_from_env()
+
+# Shared by both segment stores, so the positions are indexed once per version.
+@st.cache_resource
+def get_ownership_cache():
+    return OwnershipCache()
+
+@st.cache_resource
+def get_peer_history():
+    return peer_history_from_env()
+
+# The loader starts fetching IG, HY and positions concurrently as soon as it is
+# created, so the segment not on screen is usually ready by the time it is opened.
+@st.cache_resource
+def get_loader():
+    backend = backend_from_env()
+    if backend is None:
+        # Deferred: Snowpark is only needed without a local data directory.
+        from snowflake.snowpark.context import get_active_session
+        backend = SnowparkBackend(get_active_session())
+    return SourceLoader(backend).prefetch()
+
+# One store per segment: only the segment on screen is ever built.
+@st.cache_resource(show_spinner="Building analytics snapshot...")
+def get_snapshot_store(segment):
+    store = precomputed_store_from_env(segments=(segment,))
+    if store is None:
+        store = SnapshotStore(partial(get_loader().load, (segment, 'positions')),
+                              build=partial(build_snapshot, param_store=get_param_store(), segments=(segment,),
+                                            executor=get_executor(), ownership_cache=get_ownership_cache()))
+    count(f'snapshot.{segment}.store_created')
+    feed = intraday_feed_from_env()
+    if feed is not None:
+        # Only the touched tickers are refit and rescanned, so updates land within seconds.
+        IntradayUpdater(store, feed).start()
+    return store.start()
+
+def snapshot_caption(snapshot):
+    caption = f"Analytics snapshot built {time.strftime('%H:%M:%S', time.localtime(snapshot.built_at))}"
+    if snapshot.updated_at is not None:
+        caption += f", intraday updates to {time.strftime('%H:%M:%S', time.localtime(snapshot.updated_at))}"
+    return caption
+
+def paged_table(df, key):
+    """Filter, sort and page ``df`` on the server; only the visible page is sent to the browser."""
+    filter_col, sort_col, order_col, size_col, page_col = st.columns([3, 2, 1, 1, 1])
+    text = filter_col.text_input("Filter", key=f"{key}_filter", placeholder="ID or CUSIP contains...")
+    sort_by = sort_col.selectbox("Sort by", ["(universe order)"] + list(df.columns), key=f"{key}_sort")
+    ascending = order_col.radio("Order", ["Asc", "Desc"], key=f"{key}_order") == "Asc"
+    page_size = size_col.selectbox("Rows", PAGE_SIZES, key=f"{key}_size")
+    page = page_col.number_input("Page", min_value=1, value=1, step=1, key=f"{key}_page")
+    rows, total, n_pages = page_table(df, text, None if sort_by == "(universe order)" else sort_by,
+                                      ascending, page, page_size)
+    st.dataframe(rows, use_container_width=True)
+    start = (min(page, n_pages) - 1) * page_size
+    st.caption(f"Rows {min(start + 1, total)}-{start + len(rows)} of {total} (page {min(page, n_pages)} of {n_pages})")
+
+def download_table(label, df, file_stem, export_format):
+    """Download button whose file is only written when clicked, not on every rerun."""
+    st.download_button(label, data=lambda: export_bytes(frame_chunks(df), export_format),
+                       file_name=f"{file_stem}.{export_format}", mime=MIME_TYPES[export_format])
+
+@contextmanager
+def profiled(enabled):
+    """cProfile the block when ``enabled``; the profiler is disabled however the block exits."""
+    if not enabled:
+        yield None
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+
+def diagnostics_panel(timer, snapshot, profiler, file_stem):
+    """Sidebar timings of this rerun and the snapshot build, cache counters and the rerun profile."""
+    if profiler is not None:
+        st.sidebar.download_button("Download rerun profile", data=profile_bytes(profiler),
+                                   file_name=f"{file_stem}_rerun.prof", mime="application/octet-stream")
+    with st.sidebar.expander("Diagnostics", expanded=True):
+        st.markdown(f"**This rerun** ({timer.total():.3f}s)")
+        st.dataframe(pd.DataFrame(timer.records), use_container_width=True, hide_index=True)
+        st.markdown(f"**Snapshot build** (version `{snapshot.version[:24]}`)")
+        st.dataframe(pd.DataFrame(list(snapshot.timings)), use_container_width=True, hide_index=True)
+        st.markdown("**Cache counters**")
+        st.json(counters())
+
 # Home Page
 if page == "Home":
     st.title("Welcome!")
@@ -29,369 +157,222 @@ if page == "Home":
 
 # Curve Page
 elif page == "Curve":
+    # Deferred: plotting is only needed on this page.
+    import plotly.graph_objects as go
+    
     st.title("📈 Curve")
-    tab1, tab2 = st.tabs(["IG", "HY"])
-    with tab1:    
-        st.subheader("IG - Nelson-Siegel")
-        #st.set_option('snowflake.streamlitSleepTimeoutMinutes', 60)
-        # --- Setup Streamlit Page ---
-        #st.set_page_config(layout="wide")
-        #st.title("IG - Nelson-Siegel")
-        
-        # --- Deviation Threshold ---
-        deviation_threshold = 5
-        # Get the current credentials
-        session = get_active_session()
-        # --- Fetch Bloomberg Data ---
-        @st.cache_data(show_spinner="Fetching Bloomberg bond data...")
-        def fetch_bloomberg_data(_session):
-            conn = _session.connection  # Use the connection from the active session
-            query = "SELECT * FROM CORPORATE.INVESTMENT_GRADE.DAILY_CURVE_IG_DATA"
-            df = pd.read_sql(query, conn)
-            return df
-        df_bonds = fetch_bloomberg_data(session)
-        # --- Process Bloomberg Data ---
-        df_bonds['TICKER'] = df_bonds['TICKER'].astype(str)
-        df_bonds['COUPON'] = df_bonds['COUPON'].astype(str)
-        df_bonds['MATURDATE'] = pd.to_datetime(df_bonds['MATURDATE'], format='%Y%m%d').dt.strftime('%m/%d/%Y')
-        df_bonds.insert(3, 'ID', df_bonds['TICKER'] + ' ' + df_bonds['COUPON'] + ' ' + df_bonds['MATURDATE'])
-        df_bonds['DURADJMOD'] = pd.to_numeric(df_bonds['DURADJMOD'], errors='coerce')
-        df_bonds['OAS_BP'] = pd.to_numeric(df_bonds['OAS_BP'], errors='coerce')
-        df_bonds = df_bonds.dropna(subset=['DURADJMOD', 'OAS_BP'])
-        
-        # Remove low-frequency tickers
-        df_bonds = df_bonds[df_bonds['TICKER'].map(df_bonds['TICKER'].value_counts()) >= 5]
-        # --- Fetch Positions Data ---
-        @st.cache_data(show_spinner="Fetching Position Data...")
-        def fetch_positions(_session):
-            conn = _session.connection  # Use the connection from the active session
-            #query2 = """SELECT * FROM TRADERS.EAGLE.SELCTION_POSITIONS """
-            query = """SELECT * FROM CORPORATE.GENERAL.CORP_CURRENT_POSITIONS"""
-            df = pd.read_sql(query, conn)
-            return df
-        df_positions = fetch_positions(session)
-        # --- Process Positions ---
-        #for this data SHARE_PAR_VALUE used yo be PRICE_SOD
-        df_positions.columns = [f"{col}_{i}" if df_positions.columns.duplicated()[i] else col for i, col in enumerate(df_positions.columns)]
-        df_positions = df_positions[~df_positions['CRD_STRATEGY'].isin(['INS', 'MODEL', 'PLEDGE','UNSUP'])]
-        
-        
-        box_map = (df_positions.groupby(['CUSIP', 'TICK'])['CRD_STRATEGY']
-           .apply(lambda x: ', '.join(sorted(set(x))))
-           .reset_index()
-           .rename(columns={'CRD_STRATEGY': 'all_possible_strategies'})
-        )
-        # Step 3: Merge back and drop unnecessary columns
-        df_positions = df_positions.drop(columns=['CRD_STRATEGY']).drop_duplicates()
-        df_positions = df_positions.merge(box_map, on=['CUSIP', 'TICK'], how='left')
-        
-        
-        
-        df_positions = df_positions.groupby(['CUSIP', 'TICK', 'all_possible_strategies'])['SHARE_PAR_VALUE'].sum().reset_index()
-        df_positions['SHARE_PAR_VALUE'] = pd.to_numeric(df_positions['SHARE_PAR_VALUE'], errors='coerce')
-        df_positions = df_positions[df_positions['SHARE_PAR_VALUE'] > 2000000]
-        # --- Merge Ownership Info ---
-        df_bonds = df_bonds.merge(df_positions[['CUSIP', 'all_possible_strategies']], on='CUSIP', how='left', indicator=True)
-        df_bonds['Own?'] = df_bonds['_merge'].map({'both': 'Y', 'left_only': 'N', 'right_only': 'N'})
-        
-        
-        
-        st.success(f"Fetched bloomberg and positions data.")
-        
-        # --- Nelson-Siegel function ---
-        def ns_func(x, beta0, beta1, beta2, lambda1):
-            term1 = beta0
-            term2 = beta1 * (1 - np.exp(-x / lambda1)) / (x / lambda1)
-            term3 = beta2 * ((1 - np.exp(-x / lambda1)) / (x / lambda1) - np.exp(-x / lambda1))
-            return term1 + term2 + term3
-        
-        # --- Fit NS curve ---
-        def fit_ns_curve(x, y):
-            try:
-                initial_params = [0.01, -0.01, 0.01, 1.0]
-                params, _ = curve_fit(ns_func, x, y, p0=initial_params, maxfev=10000)
-                y_fit = ns_func(x, *params)
-                return params, y_fit
-            except Exception as e:
-                st.warning(f"Error fitting curve: {e}")
-                return None, None
-        
-        
-        trade_signals_tot = []
-        for ticker in df_bonds['TICKER'].unique():
-            df_filtered1 = df_bonds[df_bonds['TICKER'] == ticker]
-            if len(df_filtered1) < 2:
-                continue
+    
+    # Only the selected segment runs (st.tabs would execute both bodies on every rerun).
+    segment = st.radio("Segment", ["IG", "HY"], horizontal=True, label_visibility="collapsed")
+    timer = StageTimer('rerun.')
+    with profiled(profile_rerun) as profiler:
+        with timer.stage('snapshot'):
+            snapshot = get_snapshot_store(segment.lower()).current
+        count('snapshot.served')
+        
+        # --- What-if thresholds: answered from the snapshot's pair indexes, no rescan ---
+        st.sidebar.subheader("Signal thresholds")
+        if segment == "IG":
+            ig_deviation_threshold = st.sidebar.slider("IG deviation threshold (%)", *IG_THRESHOLD_RANGE,
+                                                       float(IG_DEVIATION_THRESHOLD), step=0.5)
+            ig_ratio_cutoff = st.sidebar.slider("IG ratio cutoff (OAS/Dur)", RATIO_CUTOFF_FLOOR, 40.0,
+                                                float(IG_RATIO_CUTOFF), step=0.5)
+        else:
+            hy_ratio_cutoff = st.sidebar.slider("HY ratio cutoff (OAS/Dur)", RATIO_CUTOFF_FLOOR, 60.0,
+                                                float(HY_RATIO_CUTOFF), step=0.5)
+        # --- Rendering: WebGL scatter for large issuers, paged universe tables ---
+        render_mode = st.sidebar.selectbox("Scatter rendering", ["Auto", "SVG", "WebGL"])
+        
+        def scatter_trace(n_points):
+            webgl = render_mode == "WebGL" or (render_mode == "Auto" and n_points >= SCATTERGL_MIN_POINTS)
+            return go.Scattergl if webgl else go.Scatter
+        
+        top_k = st.sidebar.number_input("Top matches per owned bond (0 = all)", min_value=0, value=0, step=1) or None
+        export_format = st.sidebar.radio("Universe export format", FORMATS, horizontal=True)
+        st.caption(snapshot_caption(snapshot))
+        if segment == "IG":
+            st.subheader("IG - Nelson-Siegel")
+            #st.set_option('snowflake.streamlitSleepTimeoutMinutes', 60)
+            # --- Setup Streamlit Page ---
+            #st.set_page_config(layout="wide")
+            #st.title("IG - Nelson-Siegel")
             
-            x = df_filtered1['DURADJMOD'].values
-            y = df_filtered1['OAS_BP'].values
-            params, y_fit = fit_ns_curve(x, y)
-        
-            if params is not None:
-                df_filtered1['NS_FIT'] = ns_func(df_filtered1['DURADJMOD'], *params)
-                df_filtered1['Deviation'] = df_filtered1['OAS_BP'] - df_filtered1['NS_FIT']
-                df_filtered1['Above/Below'] = np.where(df_filtered1['Deviation'] > 0, 'Above', 'Below')
-        
-                df_below_owned1 = df_filtered1[
-                    (df_filtered1['Own?'] == 'Y') &
-                    (df_filtered1['Deviation'] < -deviation_threshold / 100 * df_filtered1['NS_FIT'])
-                ].copy()
-        
-                df_above_unowned1 = df_filtered1[
-                    (df_filtered1['Own?'] == 'N') &
-                    (df_filtered1['Deviation'] > deviation_threshold / 100 * df_filtered1['NS_FIT'])
-                ].copy()
-        
-                for _, row_below in df_below_owned1.iterrows():
-                    for _, row_above in df_above_unowned1.iterrows():
-                        if row_above['DURADJMOD'] > row_below['DURADJMOD']:
-                            ratio = (row_above['OAS_BP'] - row_below['OAS_BP']) / (row_above['DURADJMOD'] - row_below['DURADJMOD'])
-                            if ratio > 12:
-                                trade_signals_tot.append({
-                                    "CRD_STRATEGY1": row_below[ 'all_possible_strategies'],
-                                    "Owned ID1": row_below['ID'],
-                                    "Matched ID1": row_above['ID'],
-                                    "Ratio OAS/Dur1": round(ratio, 2),
-                                    "OAS Diff1": round(row_above['OAS_BP'] - row_below['OAS_BP'], 2),
-                                    "Dur Diff1": round(row_above['DURADJMOD'] - row_below['DURADJMOD'], 2),
-                                    "Deviation Owned1": round(row_below['Deviation'], 2),
-                                    "Deviation Matched1": round(row_above['Deviation'], 2),
-                                    "Dev Diff1": round(row_above['Deviation'] - row_below['Deviation'], 2)
-                                })
+            # --- Deviation Threshold ---
+            deviation_threshold = ig_deviation_threshold
+            
+            # --- Shared Snapshot: processed bonds, NS fits and universe trades ---
+            bonds = snapshot.ig_universe
+            fits = snapshot.ig_fits
+            with timer.stage('ig.whatif') as stage:
+                df_trades_tot = snapshot.ig_pair_index.select(bonds, ig_ratio_cutoff, deviation_threshold, top_k)
+                stage['rows'] = len(df_trades_tot)
+            st.success(f"Fetched bloomberg and positions data.")
+            
+            # --- Select Ticker ---
+            selected_ticker = st.selectbox("Select a ticker", bonds.tickers)
+            with timer.stage('ig.slice') as stage:
+                # Zero-copy ticker slice; IDs are only built for these rows.
+                df_filtered = bonds.with_ids(bonds.ticker(selected_ticker))
+                stage['rows'] = len(df_filtered)
+            if len(df_filtered) < 2:
+                st.warning("Not enough bonds to fit a curve.")
+            else:
+                x = df_filtered['DURADJMOD'].values
+                y = df_filtered['OAS_BP'].values
+                params = ticker_params(fits, selected_ticker)
+            
+                if params is None:
+                    st.warning(f"Error fitting curve for {selected_ticker}.")
+                else:
+                    fit_stats = fits.loc[selected_ticker]
+                    st.caption(f"NS fit: RMSE {fit_stats['rmse']:.2f} bps over {int(fit_stats['n'])} bonds, "
+                               f"lambda1 {fit_stats['lambda1']:.2f}"
+                               + ("" if fit_stats['converged'] else " (not converged)"))
+                    # Smooth fit line on a fixed dense grid, independent of the bond count
+                    x_sorted, y_fit_sorted = curve_grid(params, x.min(), x.max())
+                    y_fit_upper = y_fit_sorted * (1 + deviation_threshold / 100)
+                    y_fit_lower = y_fit_sorted * (1 - deviation_threshold / 100)
+            
+                    with timer.stage('ig.render', rows=len(df_filtered)):
+                        # Assign colors
+                        colors = df_filtered['Own?'].map({'Y': 'red', 'N': 'blue'}).tolist()
+            
+                        # Plot
+                        fig = go.Figure()
+                        fig.add_trace(scatter_trace(len(df_filtered))(x=df_filtered['DURADJMOD'], y=df_filtered['OAS_BP'],
+                                                 mode='markers', marker=dict(size=8, color=colors),
+                                                 name='Bonds', customdata=df_filtered[['ID']],
+                                                 hovertemplate="ID: %{customdata[0]}<br>Dur: %{x}<br>OAS: %{y}<extra></extra>"))
+                        fig.add_trace(go.Scatter(x=x_sorted, y=y_fit_sorted, mode='lines', name='NS Fit', line=dict(color='black')))
+                        fig.add_trace(go.Scatter(x=x_sorted, y=y_fit_upper, mode='lines', name='Upper Bound', line=dict(dash='dash')))
+                        fig.add_trace(go.Scatter(x=x_sorted, y=y_fit_lower, mode='lines', name='Lower Bound', line=dict(dash='dash')))
+            
+                        fig.update_layout(title=f"{selected_ticker} Curve Fit",
+                                          xaxis_title="Duration (DURADJMOD)",
+                                          yaxis_title="OAS (bps)",
+                                          height=600)
+            
+                        st.plotly_chart(fig, use_container_width=True)
+            
+                    # --- Outliers (NS_FIT / Deviation come precomputed with the snapshot) ---
+                    df_below_owned = df_filtered[
+                        (df_filtered['Own?'] == 'Y') &
+                        (df_filtered['Deviation'] < -deviation_threshold / 100 * df_filtered['NS_FIT'])
+                    ]
+            
+                    df_above_unowned = df_filtered[
+                        (df_filtered['Own?'] == 'N') &
+                        (df_filtered['Deviation'] > deviation_threshold / 100 * df_filtered['NS_FIT'])
+                    ]
+            
+                    # --- Trade Generation ---
+                    with timer.stage('ig.ticker_signals') as stage:
+                        df_trades = ig_trade_table(df_filtered, ig_pairs(df_filtered, deviation_threshold, ig_ratio_cutoff))
+                        stage['rows'] = len(df_trades)
+            
+                    # --- Tables ---
+                    with timer.stage('ig.tables', rows=len(df_trades_tot)):
+                        st.subheader("Outliers (Owned & Below Line)")
+                        st.dataframe(df_below_owned[['ID', 'CUSIP', 'Deviation']].reset_index(drop=True), use_container_width=True)
+                        # Add a download button for the dataframe
+            
+                        st.subheader("Potential Trade Targets")
+                        if not df_trades.empty:
+                            st.dataframe(df_trades, use_container_width=True)
+                        else:
+                            st.info("No qualifying trade signals found for this ticker.")
+            
+                        st.subheader("Entire Universe Trade")
+                        if not df_trades_tot.empty:
+                            paged_table(df_trades_tot, 'ig_universe')
+                            download_table(f"Download IG universe ({export_format})", df_trades_tot,
+                                           "ig_universe_trades", export_format)
+                        else:
+                            st.info("No qualifying trade signals found for this ticker.")
+            
+                    with st.expander("NS fit diagnostics"):
+                        st.dataframe(fits.reset_index(), use_container_width=True)
+                        param_store = get_param_store()
+                        if param_store is not None:
+                            st.markdown(f"**{selected_ticker} parameter history**")
+                            st.dataframe(param_store.history('ig', selected_ticker), use_container_width=True)
+            
+
+
+
+
         
-                trade_signals_tot = sorted(trade_signals_tot, key=lambda x: (x['Owned ID1'], x['Ratio OAS/Dur1']), reverse=False)
-                
-        # --- Select Ticker ---
-        selected_ticker = st.selectbox("Select a ticker", sorted(df_bonds['TICKER'].unique()))
-        df_filtered = df_bonds[df_bonds['TICKER'] == selected_ticker]
-        if len(df_filtered) < 2:
-            st.warning("Not enough bonds to fit a curve.")
         else:
-            x = df_filtered['DURADJMOD'].values
-            y = df_filtered['OAS_BP'].values
-            params, y_fit = fit_ns_curve(x, y)
-        
-            if params is not None:
-                x_sorted_idx = np.argsort(x)
-                x_sorted = x[x_sorted_idx]
-                y_fit_sorted = y_fit[x_sorted_idx]
-                y_fit_upper = y_fit_sorted * (1 + deviation_threshold / 100)
-                y_fit_lower = y_fit_sorted * (1 - deviation_threshold / 100)
-        
-                # Assign colors
-                colors = df_filtered['Own?'].map({'Y': 'red', 'N': 'blue'}).tolist()
-        
-                # Plot
-                fig = go.Figure()
-                fig.add_trace(go.Scatter(x=df_filtered['DURADJMOD'], y=df_filtered['OAS_BP'],
-                                         mode='markers', marker=dict(size=8, color=colors),
-                                         name='Bonds', customdata=df_filtered[['ID']],
-                                         hovertemplate="ID: %{customdata[0]}<br>Dur: %{x}<br>OAS: %{y}<extra></extra>"))
-                fig.add_trace(go.Scatter(x=x_sorted, y=y_fit_sorted, mode='lines', name='NS Fit', line=dict(color='black')))
-                fig.add_trace(go.Scatter(x=x_sorted, y=y_fit_upper, mode='lines', name='Upper Bound', line=dict(dash='dash')))
-                fig.add_trace(go.Scatter(x=x_sorted, y=y_fit_lower, mode='lines', name='Lower Bound', line=dict(dash='dash')))
-        
-                fig.update_layout(title=f"{selected_ticker} Curve Fit",
-                                  xaxis_title="Duration (DURADJMOD)",
-                                  yaxis_title="OAS (bps)",
-                                  height=600)
-        
-                st.plotly_chart(fig, use_container_width=True)
-        
+            st.subheader("Curve - High Yield (HY)")
+            # --- Deviation Threshold ---
+            deviation_threshold = HY_DEVIATION_THRESHOLD
+            
+            # --- Shared Snapshot: processed bonds and universe trades ---
+            bonds = snapshot.hy_universe
+            with timer.stage('hy.whatif') as stage:
+                df_trades_tot = snapshot.hy_pair_index.select(bonds, hy_ratio_cutoff, top_k=top_k)
+                stage['rows'] = len(df_trades_tot)
+            st.success(f"Fetched bloomberg and positions data.")
+            
+            # --- Select Ticker ---
+            selected_ticker = st.selectbox("Select a ticker", bonds.tickers)
+            with timer.stage('hy.slice') as stage:
+                # Zero-copy ticker slice; IDs are only built for these rows.
+                df_filtered = bonds.with_ids(bonds.ticker(selected_ticker))
+                stage['rows'] = len(df_filtered)
+            
+            if len(df_filtered) < 2:
+                st.warning("Not enough bonds to fit a curve.")
+            else:
+                x = df_filtered['DURADJMOD'].values
+                y = df_filtered['OAS_BP'].values
+                
+                with timer.stage('hy.render', rows=len(df_filtered)):
+                    # Assign colors
+                    colors = df_filtered['Own?'].map({'Y': 'red', 'N': 'blue'}).tolist()
+            
+                    # Plot
+                    fig = go.Figure()
+                    fig.add_trace(scatter_trace(len(df_filtered))(x=df_filtered['DURADJMOD'], y=df_filtered['OAS_BP'],
+                                                mode='markers', marker=dict(size=8, color=colors),
+                                                name='Bonds', customdata=df_filtered[['ID']],
+                                                hovertemplate="ID: %{customdata[0]}<br>Dur: %{x}<br>OAS: %{y}<extra></extra>"))
+            
+                    fig.update_layout(title=f"{selected_ticker} Plot",
+                                          xaxis_title="Duration (DURADJMOD)",
+                                          yaxis_title="OAS (bps)",
+                                          height=600)
+                    st.plotly_chart(fig, use_container_width=True)
+            
                 # --- Outliers ---
-                df_filtered['NS_FIT'] = ns_func(df_filtered['DURADJMOD'], *params)
-                df_filtered['Deviation'] = df_filtered['OAS_BP'] - df_filtered['NS_FIT']
-                df_filtered['Above/Below'] = np.where(df_filtered['Deviation'] > 0, 'Above', 'Below')
-        
-                df_below_owned = df_filtered[
-                    (df_filtered['Own?'] == 'Y') &
-                    (df_filtered['Deviation'] < -deviation_threshold / 100 * df_filtered['NS_FIT'])
-                ].copy()
-        
-                df_above_unowned = df_filtered[
-                    (df_filtered['Own?'] == 'N') &
-                    (df_filtered['Deviation'] > deviation_threshold / 100 * df_filtered['NS_FIT'])
-                ].copy()
-        
+                df_below_owned = df_filtered[(df_filtered['Own?'] == 'Y')]
+                df_above_unowned = df_filtered[(df_filtered['Own?'] == 'N')]
                 # --- Trade Generation ---
-                trade_signals = []
-                for _, row_below in df_below_owned.iterrows():
-                    for _, row_above in df_above_unowned.iterrows():
-                        if row_above['DURADJMOD'] > row_below['DURADJMOD']:
-                            ratio = (row_above['OAS_BP'] - row_below['OAS_BP']) / (row_above['DURADJMOD'] - row_below['DURADJMOD'])
-                            if ratio > 12:
-                                trade_signals.append({
-                                    "Owned ID": row_below['ID'],
-                                    "Matched ID": row_above['ID'],
-                                    "Ratio OAS/Dur": round(ratio, 2),
-                                    "OAS Diff": round(row_above['OAS_BP'] - row_below['OAS_BP'], 2),
-                                    "Dur Diff": round(row_above['DURADJMOD'] - row_below['DURADJMOD'], 2),
-                                    "Deviation Owned": round(row_below['Deviation'], 2),
-                                    "Deviation Matched": round(row_above['Deviation'], 2),
-                                    "Dev Diff": round(row_above['Deviation'] - row_below['Deviation'], 2)
-                                })
-        
+                with timer.stage('hy.ticker_signals') as stage:
+                    df_trades = hy_trade_table(df_filtered, hy_pairs(df_filtered, hy_ratio_cutoff))
+                    stage['rows'] = len(df_trades)
                 # --- Tables ---
-                st.subheader("Outliers (Owned & Below Line)")
-                st.dataframe(df_below_owned[['ID', 'CUSIP', 'Deviation']].reset_index(drop=True), use_container_width=True)
-                # Add a download button for the dataframe
-        
+                st.subheader("Owned")
+                st.dataframe(df_below_owned[['ID', 'CUSIP']].reset_index(drop=True), use_container_width=True)
+            
                 st.subheader("Potential Trade Targets")
-                if trade_signals:
-                    df_trades = pd.DataFrame(trade_signals)
+                if not df_trades.empty:
                     st.dataframe(df_trades, use_container_width=True)
                 else:
                     st.info("No qualifying trade signals found for this ticker.")
-        
-                st.subheader("Entire Universe Trade")
-                if trade_signals_tot:
-                    df_trades_tot = pd.DataFrame(trade_signals_tot)
-                    st.dataframe(df_trades_tot, use_container_width=True)
+                    
+            st.subheader("Overall HY Trade Universe")
+            with timer.stage('hy.tables', rows=len(df_trades_tot)):
+                if not df_trades_tot.empty:
+                    paged_table(df_trades_tot, 'hy_universe')
+                    download_table(f"Download HY universe ({export_format})", df_trades_tot,
+                                   "hy_universe_trades", export_format)
                 else:
                     st.info("No qualifying trade signals found for this ticker.")
-        
-
-
-
-
     
-    with tab2:
-        st.subheader("Curve - High Yield (HY)")
-        # --- Deviation Threshold ---
-        deviation_threshold = 10
-        
-        # Get the current credentials
-        session = get_active_session()
-        
-        # --- Fetch Bloomberg Data ---
-        #@st.cache_data(show_spinner="Fetching Bloomberg bond data...",ttl=3600)
-        @st.cache_data(show_spinner="Fetching Bloomberg bond data...")
-        def fetch_bloomberg_data(_session):
-            conn = _session.connection
-            query = "SELECT * FROM CORPORATE.HIGH_YIELD.DAILY_CURVE_HY_DATA"
-            df = pd.read_sql(query, conn)
-            return df
-        df_bonds = fetch_bloomberg_data(session)
-        
-        # --- Process Bloomberg Data ---
-        df_bonds['TICKER'] = df_bonds['TICKER'].astype(str)
-        df_bonds['COUPON'] = df_bonds['COUPON'].astype(str)
-        df_bonds['MATURDATE'] = pd.to_datetime(df_bonds['MATURDATE'], format='%Y%m%d').dt.strftime('%m/%d/%Y')
-        df_bonds.insert(3, 'ID', df_bonds['TICKER'] + ' ' + df_bonds['COUPON'] + ' ' + df_bonds['MATURDATE'])
-        df_bonds['DURADJMOD'] = pd.to_numeric(df_bonds['DURADJMOD'], errors='coerce')
-        df_bonds['OAS_BP'] = pd.to_numeric(df_bonds['OAS_BP'], errors='coerce')
-        df_bonds = df_bonds.dropna(subset=['DURADJMOD', 'OAS_BP'])
-        
-        # Remove low-frequency tickers
-        #df_bonds = df_bonds[df_bonds['TICKER'].map(df_bonds['TICKER'].value_counts()) >= 5]
-        
-        # --- Fetch Positions Data ---
-        #@st.cache_data(show_spinner="Fetching Position Data...",ttl=3600)
-        @st.cache_data(show_spinner="Fetching Position Data...")
-        def fetch_positions(_session):
-            conn = _session.connection  # Use the connection from the active session
-            #query = """SELECT * FROM TRADERS.EAGLE.SELCTION_POSITIONS """
-            query = """SELECT * FROM CORPORATE.GENERAL.CORP_CURRENT_POSITIONS"""
-            df = pd.read_sql(query, conn)
-            return df
-        df_positions = fetch_positions(session)
-        
-        # --- Process Positions ---
-        #for this data SHARE_PAR_VALUE used yo be PRICE_SOD
-        df_positions.columns = [f"{col}_{i}" if df_positions.columns.duplicated()[i] else col for i, col in enumerate(df_positions.columns)]
-        df_positions = df_positions.groupby(['CUSIP', 'TICK'])['SHARE_PAR_VALUE'].sum().reset_index()
-        df_positions['SHARE_PAR_VALUE'] = pd.to_numeric(df_positions['SHARE_PAR_VALUE'], errors='coerce')
-        #df_positions = df_positions[df_positions['SHARE_PAR_VALUE'] > 2000000]
-        
-        # --- Merge Ownership Info ---
-        df_bonds = df_bonds.merge(df_positions[['CUSIP']], on='CUSIP', how='left', indicator=True)
-        df_bonds['Own?'] = df_bonds['_merge'].map({'both': 'Y', 'left_only': 'N', 'right_only': 'N'})
-        st.success(f"Fetched bloomberg and positions data.")
-        
-        # --- Trade Generation for All Tickers ---
-        trade_signals_tot = []
-        for ticker in df_bonds['TICKER'].unique():
-            df_filtered1 = df_bonds[df_bonds['TICKER'] == ticker]
-            if len(df_filtered1) < 2:
-                continue
-            df_below_owned1 = df_filtered1[(df_filtered1['Own?'] == 'Y')].copy()
-            df_above_unowned1 = df_filtered1[(df_filtered1['Own?'] == 'N')].copy()
-            for _, row_below in df_below_owned1.iterrows():
-                for _, row_above in df_filtered1.iterrows():
-                    if row_above['DURADJMOD'] > row_below['DURADJMOD']:
-                        ratio = (row_above['OAS_BP'] - row_below['OAS_BP']) / (row_above['DURADJMOD'] - row_below['DURADJMOD'])
-                        if ratio > 20:
-                            trade_signals_tot.append({
-                                "Cusip": row_below['CUSIP'],
-                                "Owned": row_below['ID'],
-                                "Matched": row_above['ID'],
-                                "Cusip Matched": row_above['CUSIP'],
-                                "Ratio OAS/Dur1": round(ratio, 2),
-                                "OAS": round(row_above['OAS_BP'] - row_below['OAS_BP'], 2),
-                                "Dur": round(row_above['DURADJMOD'] - row_below['DURADJMOD'], 2),
-                            })
-            trade_signals_tot = sorted(trade_signals_tot, key=lambda x: (x['Owned'], x['Ratio OAS/Dur1']), reverse=False)
-        
-        # --- Select Ticker ---
-        selected_ticker = st.selectbox("Select a ticker", sorted(df_bonds['TICKER'].unique()))
-        df_filtered = df_bonds[df_bonds['TICKER'] == selected_ticker]
-        
-        if len(df_filtered) < 2:
-            st.warning("Not enough bonds to fit a curve.")
-        else:
-            x = df_filtered['DURADJMOD'].values
-            y = df_filtered['OAS_BP'].values
-            
-            # Assign colors
-            colors = df_filtered['Own?'].map({'Y': 'red', 'N': 'blue'}).tolist()
-        
-            # Plot
-            fig = go.Figure()
-            fig.add_trace(go.Scatter(x=df_filtered['DURADJMOD'], y=df_filtered['OAS_BP'],
-                                        mode='markers', marker=dict(size=8, color=colors),
-                                        name='Bonds', customdata=df_filtered[['ID']],
-                                        hovertemplate="ID: %{customdata[0]}<br>Dur: %{x}<br>OAS: %{y}<extra></extra>"))
-        
-            fig.update_layout(title=f"{selected_ticker} Plot",
-                                  xaxis_title="Duration (DURADJMOD)",
-                                  yaxis_title="OAS (bps)",
-                                  height=600)
-            st.plotly_chart(fig, use_container_width=True)
-        
-            # --- Outliers ---
-            df_below_owned = df_filtered[(df_filtered['Own?'] == 'Y')].copy()
-            df_above_unowned = df_filtered[(df_filtered['Own?'] == 'N')].copy()
-            # --- Trade Generation ---
-            trade_signals = []
-            for _, row_below in df_below_owned.iterrows():
-                for _, row_above in df_above_unowned.iterrows():
-                    if row_above['DURADJMOD'] > row_below['DURADJMOD']:
-                        ratio = (row_above['OAS_BP'] - row_below['OAS_BP']) / (row_above['DURADJMOD'] - row_below['DURADJMOD'])
-                        if ratio > 20:
-                            trade_signals.append({
-                                "Owned ID": row_below['ID'],
-                                "Matched ID": row_above['ID'],
-                                "Ratio OAS/Dur": round(ratio, 2),
-                                "OAS Diff": round(row_above['OAS_BP'] - row_below['OAS_BP'], 2),
-                                "Dur Diff": round(row_above['DURADJMOD'] - row_below['DURADJMOD'], 2),
-                            })
-            # --- Tables ---
-            st.subheader("Owned")
-            st.dataframe(df_below_owned[['ID', 'CUSIP']].reset_index(drop=True), use_container_width=True)
-        
-            st.subheader("Potential Trade Targets")
-            if trade_signals:
-                df_trades = pd.DataFrame(trade_signals)
-                st.dataframe(df_trades, use_container_width=True)
-            else:
-                st.info("No qualifying trade signals found for this ticker.")
-                
-        st.subheader("Overall HY Trade Universe")
-        if trade_signals_tot:
-            df_trades_tot = pd.DataFrame(trade_signals_tot)
-            st.dataframe(df_trades_tot, use_container_width=True)
-        else:
-            st.info("No qualifying trade signals found for this ticker.")
+    # --- Diagnostics ---
+    if show_diagnostics:
+        diagnostics_panel(timer, snapshot, profiler, 'curve')
     
 # Fundamental Page
 elif page == "Fundamental":
@@ -407,19 +388,47 @@ elif page == "Fundamental":
 # Z-Score
 elif page == "Z-Score of Peers":
     st.title("📉 Z-Score of Peers")
-    tab1, tab2 = st.tabs(["IG", "HY"])
-    with tab1:
-        st.subheader("The dog union demands more treats before continuing work")
-
-        if st.button("Make it Rain!"):
-            treats = ["🦴", "🍖"]
-            for _ in range(3):
-                col = st.columns(5)
-                with col[random.randint(0, 2)]:
-                    st.markdown(f"<h1 style='text-align: center;'>{random.choice(treats)}</h1>", unsafe_allow_html=True)
-        
-        st.image("A realistic image of a golden doodle wearing a construction hard hat and construction attire, standi.jpeg")
-    with tab2:
-        st.subheader("Ehhhh.... Sorry pal, we are still under construction")
-        st.image("A realistic image of a bird wearing a construction hard hat and construction attire, standing on a c.jpeg")
-
+    segment = st.radio("Segment", ["IG", "HY"], horizontal=True, label_visibility="collapsed")
+    timer = StageTimer('rerun.')
+    with profiled(profile_rerun) as profiler:
+        with timer.stage('snapshot'):
+            snapshot = get_snapshot_store(segment.lower()).current
+        count('snapshot.served')
+        bonds = snapshot.ig_universe if segment == "IG" else snapshot.hy_universe
+        
+        # --- Peer buckets: peer key x duration bucket, scored in one vectorized pass ---
+        st.sidebar.subheader("Peer buckets")
+        peer_key = st.sidebar.selectbox("Peer group", available_peer_keys(bonds.frame))
+        min_peers = st.sidebar.slider("Minimum bonds per bucket", 2, 20, MIN_PEERS)
+        z_cutoff = st.sidebar.slider("Show |z| at least", 0.0, 4.0, 2.0, step=0.25)
+        with timer.stage(f'{segment.lower()}.peer_z', rows=len(bonds)):
+            scores = peer_zscores(bonds.frame, peer_key, min_peers=min_peers)
+        
+        # --- Own history: today's level against the bond's rolling daily mean/std ---
+        peer_history = get_peer_history()
+        days = peer_history.days(segment.lower()) if peer_history is not None else []
+        if days:
+            with timer.stage(f'{segment.lower()}.history_z'):
+                # Today's day (recorded by the pipeline) is left out of the window it is scored against.
+                stats = peer_history.stats(segment.lower(), before=date.today().isoformat())
+                scores = scores.join(history_zscores(bonds.frame, stats))
+        
+        z_columns = [c for c in ('OAS_Z', 'DEV_Z', 'OAS_HZ', 'DEV_HZ') if c in scores]
+        flagged = (scores[z_columns].abs() >= z_cutoff).any(axis=1).to_numpy()
+        strength = scores[z_columns].abs().max(axis=1).to_numpy()[flagged]
+        rows = bonds.frame[flagged].iloc[np.argsort(-strength, kind='stable')]
+        rows = bonds.with_ids(rows)
+        columns = [c for c in ('ID', 'CUSIP', 'Own?', 'DURADJMOD', 'OAS_BP', 'Deviation') if c in rows]
+        table = rows[columns].join(scores).reset_index(drop=True)
+        
+        st.caption(snapshot_caption(snapshot)
+                   + (f"; history {days[0]} to {days[-1]} ({len(days)} days)" if days else
+                      "; set NS_APP_PEER_HISTORY for z-scores against each bond's own history"))
+        st.subheader(f"{segment} bonds with |z| ≥ {z_cutoff:g} ({len(table)} of {len(bonds)})")
+        if not table.empty:
+            paged_table(table, f'{segment.lower()}_peer_z')
+        else:
+            st.info("No bonds stand out from their peers at this cutoff.")
+    
+    if show_diagnostics:
+        diagnostics_panel(timer, snapshot, profiler, 'z_score')
@@ -0,0 +1 @@
+"""Analytics helpers behind the Curve page of NS_GIT_APP."""
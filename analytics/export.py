@@ -0,0 +1,62 @@
+"""Chunked CSV/Parquet export of trade tables.
+
+``write_chunks`` writes an iterable of same-schema frames one chunk at a
+time, so a streamed universe table is never materialized in full.
+"""
+import io
+
+FORMATS = ('csv', 'parquet')
+MIME_TYPES = {'csv': 'text/csv', 'parquet': 'application/octet-stream'}
+
+
+def write_chunks(chunks, target, fmt='csv'):
+    """Write frames from ``chunks`` to a path or binary file object; returns the row count."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}; expected one of {FORMATS}")
+    if fmt == 'parquet':
+        return _write_parquet(chunks, target)
+    rows = 0
+    header = True
+    own = isinstance(target, str)
+    f = open(target, 'wb') if own else target
+    try:
+        for chunk in chunks:
+            f.write(chunk.to_csv(index=False, header=header).encode())
+            header = False
+            rows += len(chunk)
+    finally:
+        if own:
+            f.close()
+    return rows
+
+
+def _write_parquet(chunks, target):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    rows = 0
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(target, table.schema)
+            writer.write_table(table.cast(writer.schema))
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def frame_chunks(df, chunk_rows=50000):
+    """Split an in-memory table into ``chunk_rows`` slices (one, if empty) for ``write_chunks``."""
+    for start in range(0, max(len(df), 1), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def export_bytes(chunks, fmt='csv'):
+    """The export as bytes, e.g. for ``st.download_button``."""
+    buffer = io.BytesIO()
+    write_chunks(chunks, buffer, fmt)
+    return buffer.getvalue()
@@ -0,0 +1,56 @@
+"""Lightweight stage timing, counters and profiling for the Curve page.
+
+``StageTimer.stage`` times a block, records its row count and emits one
+structured (JSON) log line per stage.  ``count`` bumps process-wide counters
+such as loader cache hits/misses.  ``profile_bytes`` turns a finished
+``cProfile.Profile`` into the ``.prof`` format ``pstats``/snakeviz read.
+"""
+import json
+import logging
+import marshal
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+_counters = Counter()
+_counters_lock = threading.Lock()
+
+
+class StageTimer:
+    def __init__(self, prefix=''):
+        self.prefix = prefix
+        self.records = []
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        """Time the block; set ``record['rows']`` inside it to report a row count."""
+        record = {'stage': f"{self.prefix}{name}", 'seconds': None, 'rows': rows}
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = round(time.perf_counter() - started, 6)
+            self.records.append(record)
+            logger.info(json.dumps({'event': 'stage', **record}))
+
+    def total(self):
+        return sum(r['seconds'] for r in self.records)
+
+
+def count(name, n=1):
+    with _counters_lock:
+        _counters[name] += n
+
+
+def counters():
+    with _counters_lock:
+        return dict(_counters)
+
+
+def profile_bytes(profiler):
+    """Serialized stats of a stopped ``cProfile.Profile`` (same format as ``dump_stats``)."""
+    profiler.create_stats()
+    return marshal.dumps(profiler.stats)
@@ -0,0 +1,224 @@
+"""Intraday OAS/duration updates applied to a live analytics snapshot.
+
+Intraday only a few bonds move.  ``apply_updates`` takes a batch of
+``(CUSIP, OAS_BP, DURADJMOD)`` rows, refits the NS curves of just the
+tickers they touch, recomputes those tickers' deviations and outliers and
+splices their rows of the pair indexes, so the work follows the size of the
+change rather than the universe.  The snapshot itself is never edited:
+changed columns and indexes are copies and the rest is shared.
+
+``IntradayUpdater`` polls a feed and patches a ``SnapshotStore``.  The feeds
+here stand in for a market data subscription: ``FileFeed`` tails a CSV file
+(``NS_APP_INTRADAY_FEED``) and ``QueueFeed`` drains an in-process queue.
+"""
+import io
+import logging
+import os
+import queue
+import threading
+import time
+from dataclasses import replace
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from analytics.instrumentation import StageTimer, count
+from analytics.nelson_siegel import FIT_COLUMNS, fit_ns_batch
+from analytics.processing import IG_DEVIATION_THRESHOLD, add_ns_deviation
+from analytics.signals import hy_pair_index, ig_pair_index
+from analytics.snapshot import SEGMENTS
+
+logger = logging.getLogger(__name__)
+
+UPDATE_COLUMNS = ['CUSIP', 'OAS_BP', 'DURADJMOD']
+INTRADAY_FEED_ENV = 'NS_APP_INTRADAY_FEED'
+POLL_INTERVAL_SECONDS = 5
+
+
+def _empty_updates():
+    return pd.DataFrame({'CUSIP': pd.Series(dtype=str), 'OAS_BP': pd.Series(dtype=np.float64),
+                         'DURADJMOD': pd.Series(dtype=np.float64)})
+
+
+def normalize_updates(updates):
+    """The last update per CUSIP as ``UPDATE_COLUMNS``; a missing OAS or duration means unchanged."""
+    if len(updates) == 0:
+        return _empty_updates()
+    df = pd.DataFrame({
+        'CUSIP': updates['CUSIP'].astype(str).to_numpy(),
+        'OAS_BP': pd.to_numeric(updates['OAS_BP'], errors='coerce').to_numpy(dtype=np.float64),
+        'DURADJMOD': (pd.to_numeric(updates['DURADJMOD'], errors='coerce').to_numpy(dtype=np.float64)
+                      if 'DURADJMOD' in updates else np.nan),
+    })
+    df = df.dropna(subset=['OAS_BP', 'DURADJMOD'], how='all')
+    return df.drop_duplicates('CUSIP', keep='last').reset_index(drop=True)
+
+
+def apply_updates(snapshot, updates, deviation_threshold=IG_DEVIATION_THRESHOLD, timer=None):
+    """``(snapshot, summary)`` with ``updates`` applied to each segment ``snapshot`` holds.
+
+    ``summary`` has one entry per touched segment (``bonds`` updated, refitted
+    ``tickers`` and, for IG, their owned ``outliers`` below the band) and
+    ``unmatched``: updates whose CUSIP is in no segment.  Those are skipped;
+    new bonds arrive with the next full refresh.
+    """
+    timer = timer or StageTimer('intraday.')
+    updates = normalize_updates(updates)
+    fields, summary = {}, {}
+    matched = np.zeros(len(updates), dtype=bool)
+    for segment in SEGMENTS:
+        universe = getattr(snapshot, f'{segment}_universe')
+        if universe is None:
+            continue
+        rows = universe.cusip_rows(updates['CUSIP'])
+        hit = rows >= 0
+        matched |= hit
+        if not hit.any():
+            continue
+        with timer.stage(f'{segment}.patch', rows=int(hit.sum())):
+            patched, summary[segment] = _patch_segment(snapshot, segment, rows[hit], updates[hit],
+                                                       deviation_threshold)
+        fields.update(patched)
+    summary['unmatched'] = int((~matched).sum())
+    if not fields:
+        return snapshot, summary
+    return replace(snapshot, updated_at=time.time(), **fields), summary
+
+
+def _patch_segment(snapshot, segment, rows, updates, deviation_threshold):
+    universe = getattr(snapshot, f'{segment}_universe')
+    # Everything below is scoped to the bonds of the touched tickers.
+    tickers = list(pd.unique(universe.bonds(rows)['TICKER'].to_numpy()))
+    ticker_rows = universe.rows(tickers)
+    sub = universe.bonds(ticker_rows)
+    at = np.searchsorted(ticker_rows, rows)
+    changed = ['OAS_BP', 'DURADJMOD']
+    for col in changed:
+        values = sub[col].to_numpy(dtype=np.float64).copy()
+        new = updates[col].to_numpy()
+        values[at] = np.where(np.isnan(new), values[at], new)
+        sub[col] = values
+    fields = {}
+    if segment == 'ig':
+        refit = fit_ns_batch(sub['TICKER'], sub['DURADJMOD'], sub['OAS_BP'])
+        fits = snapshot.ig_fits.copy()
+        fits.loc[refit.index, FIT_COLUMNS] = refit[FIT_COLUMNS]
+        if 'source' in fits:
+            fits.loc[refit.index, 'source'] = 'intraday'
+        fields['ig_fits'] = fits
+        sub = add_ns_deviation(sub, refit)
+        changed += ['NS_FIT', 'Deviation', 'Above/Below']
+        index = ig_pair_index(sub)
+        band = deviation_threshold / 100 * sub['NS_FIT']
+        outliers = sub.loc[(sub['Own?'] == 'Y') & (sub['Deviation'] < -band), ['ID', 'CUSIP', 'Deviation']]
+    else:
+        index = hy_pair_index(sub)
+        outliers = None
+
+    fields[f'{segment}_universe'] = universe.replace_values(ticker_rows, {c: sub[c].to_numpy() for c in changed})
+    fields[f'{segment}_pair_index'] = getattr(snapshot, f'{segment}_pair_index').replace_tickers(
+        index, ticker_rows, universe.ticker_codes())
+    return fields, {'bonds': len(rows), 'tickers': tickers, 'outliers': outliers}
+
+
+class FileFeed:
+    """Tails a CSV file of ``UPDATE_COLUMNS``; each ``poll`` returns the complete lines added since the last."""
+
+    def __init__(self, path):
+        self.path = path
+        self._offset = 0
+        self._header = None
+
+    def poll(self):
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return _empty_updates()
+        with f:
+            if os.fstat(f.fileno()).st_size < self._offset:
+                # Truncated or replaced: start again from the top.
+                self._offset, self._header = 0, None
+            f.seek(self._offset)
+            data = f.read()
+        data = data[:data.rfind(b'\n') + 1]
+        self._offset += len(data)
+        if self._header is None and data:
+            header, _, data = data.partition(b'\n')
+            self._header = header + b'\n'
+        if not data:
+            return _empty_updates()
+        return pd.read_csv(io.BytesIO(self._header + data), dtype={'CUSIP': str})
+
+
+def write_updates(path, updates):
+    """Append ``updates`` to a ``FileFeed`` file, writing the header if the file is new."""
+    new = not os.path.exists(path) or os.path.getsize(path) == 0
+    with open(path, 'a', newline='') as f:
+        f.write(updates[UPDATE_COLUMNS].to_csv(index=False, header=new))
+
+
+class QueueFeed:
+    """Drains update frames (or single-row dicts) put on a ``queue.Queue``."""
+
+    def __init__(self, updates=None):
+        self.queue = updates if updates is not None else queue.Queue()
+
+    def put(self, updates):
+        self.queue.put(updates)
+
+    def poll(self):
+        batches = []
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            batches.append(item if isinstance(item, pd.DataFrame) else pd.DataFrame([item]))
+        return pd.concat(batches, ignore_index=True) if batches else _empty_updates()
+
+
+class IntradayUpdater:
+    """Polls ``feed`` on a daemon thread and patches ``store`` with each non-empty batch."""
+
+    def __init__(self, store, feed, interval=POLL_INTERVAL_SECONDS, deviation_threshold=IG_DEVIATION_THRESHOLD):
+        self._store = store
+        self._feed = feed
+        self._interval = interval
+        self._deviation_threshold = deviation_threshold
+        self._stop = threading.Event()
+        self._thread = None
+
+    def poll(self):
+        """Apply whatever the feed has; returns the ``apply_updates`` summary, or ``None`` if it had nothing."""
+        updates = self._feed.poll()
+        if updates.empty:
+            return None
+        timer = StageTimer('intraday.')
+        summary = self._store.patch(partial(apply_updates, updates=updates,
+                                            deviation_threshold=self._deviation_threshold, timer=timer))
+        count('intraday.batches')
+        logger.info("Applied %d intraday updates in %.3fs (%d unmatched)", len(updates), timer.total(),
+                    summary['unmatched'])
+        return summary
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='intraday-updater', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            try:
+                self.poll()
+            except Exception:
+                logger.exception("Intraday update failed; keeping the current snapshot")
+
+
+def intraday_feed_from_env():
+    path = os.environ.get(INTRADAY_FEED_ENV)
+    return FileFeed(path) if path else None
@@ -0,0 +1,157 @@
+"""Source loaders with projection, TTL and incremental refresh.
+
+A backend reads one ``TableSpec`` projected to its columns, optionally only
+rows with ``as_of > since``.  ``SnowparkBackend`` goes through Snowpark's
+Arrow-based ``to_pandas``; ``ParquetBackend`` and ``SQLiteBackend`` are local
+stand-ins for development and testing.  ``SourceLoader`` keeps each table in
+memory for ``ttl`` seconds and then refreshes it, incrementally when the spec
+has an ``as_of`` column.  Incremental refreshes only see new and changed rows,
+never removed ones (matured bonds, sold positions), so every
+``full_reload_every``-th refresh reloads the whole table.  Tables are fetched concurrently on a thread pool, and
+``prefetch`` starts that in the background so a cold start overlaps the queries.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from analytics.instrumentation import count
+from analytics.sources import SOURCES
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 3600
+# With the default TTL, a full reload about once a day.
+DEFAULT_FULL_RELOAD_EVERY = 24
+DATA_DIR_ENV = 'NS_APP_DATA_DIR'
+
+
+class SnowparkBackend:
+    def __init__(self, session):
+        self.session = session
+
+    def read(self, spec, since=None):
+        from snowflake.snowpark.functions import col, lit
+
+        df = self.session.table(spec.name).select(*spec.projection)
+        if since is not None:
+            df = df.filter(col(spec.as_of) > lit(since))
+        return df.to_pandas()
+
+
+class ParquetBackend:
+    """Reads ``<root>/<table name>.parquet``."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, spec):
+        return os.path.join(self.root, f"{spec.name}.parquet")
+
+    def read(self, spec, since=None):
+        filters = [(spec.as_of, '>', since)] if since is not None else None
+        return pd.read_parquet(self.path(spec), columns=list(spec.projection), filters=filters)
+
+
+class SQLiteBackend:
+    """Reads the table named after the spec from a local SQLite file."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def read(self, spec, since=None):
+        cols = ', '.join(f'"{c}"' for c in spec.projection)
+        query = f'SELECT {cols} FROM "{spec.name}"'
+        params = ()
+        if since is not None:
+            query += f' WHERE "{spec.as_of}" > ?'
+            params = (since,)
+        with sqlite3.connect(self.path) as conn:
+            return pd.read_sql(query, conn, params=params)
+
+
+def local_backend(path):
+    """Pick the local backend for a directory of Parquet files or a SQLite file."""
+    return ParquetBackend(path) if os.path.isdir(path) else SQLiteBackend(path)
+
+
+def backend_from_env():
+    """Local backend configured through ``NS_APP_DATA_DIR``, if any."""
+    path = os.environ.get(DATA_DIR_ENV)
+    return local_backend(path) if path else None
+
+
+class SourceLoader:
+    """Caches projected source tables with a TTL and incremental refresh."""
+
+    def __init__(self, backend, specs=SOURCES, ttl=DEFAULT_TTL_SECONDS, full_reload_every=DEFAULT_FULL_RELOAD_EVERY):
+        self.backend = backend
+        self.specs = specs
+        self.ttl = ttl
+        self.full_reload_every = full_reload_every
+        self._frames = {}
+        self._loaded_at = {}
+        self._watermarks = {}
+        self._incremental = {}
+        # One lock per table: a table is fetched once even when several callers
+        # (or a prefetch) ask for it together, while different tables load in parallel.
+        self._locks = {name: threading.Lock() for name in specs}
+
+    def load(self, names=None, force=False):
+        """Source frames as ``{name: DataFrame}`` (all sources unless ``names`` is given)."""
+        names = list(self.specs) if names is None else list(names)
+        if len(names) == 1:
+            return {names[0]: self._get(names[0], force)}
+        with ThreadPoolExecutor(max_workers=len(names), thread_name_prefix='source-load') as pool:
+            frames = list(pool.map(lambda name: self._get(name, force), names))
+        return dict(zip(names, frames))
+
+    def prefetch(self, names=None):
+        """Start loading ``names`` (default: all) on a background thread; returns ``self``."""
+        threading.Thread(target=self._prefetch, args=(names,), name='source-prefetch', daemon=True).start()
+        return self
+
+    def _prefetch(self, names):
+        try:
+            self.load(names)
+        except Exception:
+            logger.exception("Source prefetch failed; tables will load on first use")
+
+    def _get(self, name, force):
+        with self._locks[name]:
+            return self._fetch(name, force)
+
+    def _fetch(self, name, force):
+        loaded_at = self._loaded_at.get(name)
+        if not force and loaded_at is not None and time.monotonic() - loaded_at < self.ttl:
+            count(f'loader.{name}.hit')
+            return self._frames[name]
+        spec = self.specs[name]
+        if (force or name not in self._frames or not spec.as_of
+                or self._incremental[name] + 1 >= self.full_reload_every):
+            count(f'loader.{name}.miss')
+            df = self.backend.read(spec)
+            self._incremental[name] = 0
+        else:
+            count(f'loader.{name}.incremental')
+            df = self._merge(spec, self._frames[name], self.backend.read(spec, since=self._watermarks[name]))
+            self._incremental[name] += 1
+        self._frames[name] = df
+        self._loaded_at[name] = time.monotonic()
+        if spec.as_of and len(df):
+            self._watermarks[name] = df[spec.as_of].max()
+        else:
+            self._watermarks[name] = None
+        return df
+
+    @staticmethod
+    def _merge(spec, current, delta):
+        """Upsert ``delta`` rows into ``current`` on the spec key."""
+        if delta.empty:
+            return current
+        df = pd.concat([current, delta], ignore_index=True)
+        return df.drop_duplicates(subset=list(spec.key), keep='last', ignore_index=True)
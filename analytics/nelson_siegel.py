@@ -0,0 +1,181 @@
+"""Nelson-Siegel curve fitting.
+
+For a fixed ``lambda1`` the NS curve is linear in ``beta0..beta2``, so the
+profiled solver grid-searches ``lambda1`` and, at each grid point, solves the
+betas of every ticker at once from per-ticker normal equations.  An optional
+short ``curve_fit`` polish starts from the best grid point.  The original
+cold-start ``curve_fit`` per ticker is kept as ``method='curve_fit'``.
+"""
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+INITIAL_PARAMS = [0.01, -0.01, 0.01, 1.0]
+PARAM_COLUMNS = ['beta0', 'beta1', 'beta2', 'lambda1']
+FIT_COLUMNS = PARAM_COLUMNS + ['n', 'rss', 'rmse', 'converged']
+DEFAULT_LAMBDAS = np.geomspace(0.1, 30.0, 80)
+# Warm starts search a narrow grid around the previous lambda1.
+WARM_LAMBDA_FACTORS = np.geomspace(0.5, 2.0, 15)
+MIN_BONDS = len(PARAM_COLUMNS)
+CURVE_GRID_POINTS = 200
+
+
+# --- Nelson-Siegel function ---
+def ns_func(x, beta0, beta1, beta2, lambda1):
+    term1 = beta0
+    term2 = beta1 * (1 - np.exp(-x / lambda1)) / (x / lambda1)
+    term3 = beta2 * ((1 - np.exp(-x / lambda1)) / (x / lambda1) - np.exp(-x / lambda1))
+    return term1 + term2 + term3
+
+
+# --- Fit NS curve ---
+def fit_ns_curve(x, y, p0=None, maxfev=10000):
+    """Single-ticker ``curve_fit``; returns ``(None, None)`` when the fit fails."""
+    # SciPy is only needed for this path; importing it lazily keeps app start-up light.
+    from scipy.optimize import curve_fit
+
+    try:
+        initial_params = INITIAL_PARAMS if p0 is None else p0
+        params, _ = curve_fit(ns_func, x, y, p0=initial_params, maxfev=maxfev)
+        y_fit = ns_func(x, *params)
+        return params, y_fit
+    except Exception:
+        return None, None
+
+
+def _design(x, lambda1):
+    z = x / lambda1
+    decay = np.exp(-z)
+    slope = (1 - decay) / z
+    return np.column_stack([np.ones_like(x), slope, slope - decay])
+
+
+def fit_ns_batch(tickers, x, y, method='profiled', lambdas=DEFAULT_LAMBDAS, polish=False,
+                 polish_maxfev=200):
+    """Fit one NS curve per ticker.
+
+    ``lambdas`` is either one grid shared by all tickers or an array of shape
+    ``(n_tickers, k)`` with one grid per ticker in first-appearance order.
+    Returns a frame indexed by ticker (first-appearance order) with the
+    parameters, bond count ``n``, residual sum of squares, RMSE and a
+    ``converged`` flag.  Tickers that cannot be fitted have NaN parameters.
+    """
+    codes, uniques = pd.factorize(np.asarray(tickers))
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    order = np.argsort(codes, kind='stable')
+    codes, xs, ys = codes[order], x[order], y[order]
+    counts = np.bincount(codes, minlength=len(uniques))
+    starts = np.cumsum(counts) - counts
+
+    out = pd.DataFrame(np.nan, index=pd.Index(uniques, name='TICKER'), columns=FIT_COLUMNS)
+    out['n'] = counts
+    out['converged'] = False
+    if len(uniques) == 0:
+        return out
+
+    best_rss = np.full(len(uniques), np.inf)
+    best = np.full((len(uniques), 4), np.nan)
+    if method == 'curve_fit':
+        for g in np.flatnonzero(counts >= MIN_BONDS):
+            sl = slice(starts[g], starts[g] + counts[g])
+            params, y_fit = fit_ns_curve(xs[sl], ys[sl])
+            if params is not None:
+                best[g], best_rss[g] = params, np.sum((ys[sl] - y_fit) ** 2)
+        fitted = np.isfinite(best_rss)
+        return _fit_frame(out, best, best_rss, fitted, fitted.copy())
+    if method != 'profiled':
+        raise ValueError(f"Unknown NS fit method: {method}")
+
+    # One shared lambda1 grid, or one grid per ticker (rows in first-appearance order).
+    grid = np.asarray(lambdas, dtype=np.float64)
+    if grid.ndim == 1:
+        grid = np.broadcast_to(grid, (len(uniques), len(grid)))
+    for k in range(grid.shape[1]):
+        lambda1 = grid[:, k]
+        X = _design(xs, lambda1[codes])
+        xtx = np.add.reduceat(X[:, :, None] * X[:, None, :], starts, axis=0)
+        xty = np.add.reduceat(X * ys[:, None], starts, axis=0)
+        # Non-finite systems (e.g. zero durations) would stop the SVD; skip them.
+        bad = ~(np.isfinite(xtx).all(axis=(1, 2)) & np.isfinite(xty).all(axis=1))
+        xtx[bad], xty[bad] = 0, 0
+        beta = (np.linalg.pinv(xtx, rcond=1e-12) @ xty[:, :, None])[:, :, 0]
+        resid = ys - np.einsum('ij,ij->i', X, beta[codes])
+        rss = np.add.reduceat(resid ** 2, starts)
+        rss[bad] = np.inf
+        better = rss < best_rss
+        best_rss[better] = rss[better]
+        best[better, :3] = beta[better]
+        best[better, 3] = lambda1[better]
+
+    fitted = (counts >= MIN_BONDS) & np.isfinite(best_rss)
+    # A minimum on the edge of the grid means lambda1 was not bracketed.
+    interior = (best[:, 3] > grid[:, 0]) & (best[:, 3] < grid[:, -1])
+    converged = fitted & interior
+
+    if polish:
+        for g in np.flatnonzero(fitted):
+            sl = slice(starts[g], starts[g] + counts[g])
+            params, y_fit = fit_ns_curve(xs[sl], ys[sl], p0=best[g], maxfev=polish_maxfev)
+            if params is None:
+                continue
+            rss = float(np.sum((ys[sl] - y_fit) ** 2))
+            if rss <= best_rss[g]:
+                best[g], best_rss[g] = params, rss
+            converged[g] = True
+
+    return _fit_frame(out, best, best_rss, fitted, converged)
+
+
+def _fit_frame(out, best, best_rss, fitted, converged):
+    out.loc[fitted, PARAM_COLUMNS] = best[fitted]
+    out.loc[fitted, 'rss'] = best_rss[fitted]
+    out['rmse'] = np.sqrt(out['rss'] / out['n'])
+    out['converged'] = converged
+    return out
+
+
+def warm_lambda_grid(tickers, previous, factors=WARM_LAMBDA_FACTORS):
+    """Per-ticker grids around ``previous['lambda1']`` for ``fit_ns_batch``.
+
+    Tickers without a usable previous fit get a coarse default-range grid.
+    """
+    _, uniques = pd.factorize(np.asarray(tickers))
+    hint = previous['lambda1'].reindex(uniques).to_numpy(dtype=np.float64)
+    # Clipped to the default range so boundary fits cannot drift further each day.
+    grid = np.clip(np.abs(hint)[:, None] * factors[None, :], DEFAULT_LAMBDAS[0], DEFAULT_LAMBDAS[-1])
+    cold = ~np.isfinite(grid).all(axis=1) | (grid[:, 0] <= 0)
+    grid[cold] = np.geomspace(DEFAULT_LAMBDAS[0], DEFAULT_LAMBDAS[-1], len(factors))
+    return grid
+
+
+def fitted_values(fits, tickers, x):
+    """Evaluate each row's ticker curve at its duration (NaN where unfitted)."""
+    params = fits[PARAM_COLUMNS].reindex(np.asarray(tickers)).to_numpy(dtype=np.float64)
+    return ns_func(np.asarray(x, dtype=np.float64), *params.T)
+
+
+def curve_grid(params, x_min, x_max, points=CURVE_GRID_POINTS):
+    """``(durations, ns_func values)`` on an even grid over ``[x_min, x_max]``, for plotting.
+
+    Cached per parameter tuple and range; the returned arrays are read-only.
+    """
+    return _curve_grid(tuple(float(p) for p in params), float(x_min), float(x_max), int(points))
+
+
+@lru_cache(maxsize=1024)
+def _curve_grid(params, x_min, x_max, points):
+    grid = np.linspace(x_min, x_max, points)
+    values = ns_func(grid, *params)
+    grid.flags.writeable = False
+    values.flags.writeable = False
+    return grid, values
+
+
+def ticker_params(fits, ticker):
+    """Parameters for one ticker, or ``None`` if it has no usable fit."""
+    if ticker not in fits.index:
+        return None
+    params = fits.loc[ticker, PARAM_COLUMNS].to_numpy(dtype=np.float64)
+    return params if np.isfinite(params).all() else None
@@ -0,0 +1,100 @@
+"""CUSIP-keyed ownership index built once from the positions table.
+
+The index holds par by strategy, the set of strategies holding each CUSIP as
+a bitmask (one uint64 word per 64 strategies), and precomputed views for the IG rule (excluded strategies
+dropped, par > 2mm) and the HY rule (any position).  Bond frames join
+against it with a single ``get_indexer`` lookup.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+IG_EXCLUDED_STRATEGIES = ['INS', 'MODEL', 'PLEDGE', 'UNSUP']
+IG_MIN_PAR = 2000000
+WORD_BITS = 64
+
+
+@dataclass(frozen=True)
+class OwnershipIndex:
+    cusips: pd.Index
+    strategies: pd.Index
+    par: np.ndarray             # (n_cusips, n_strategies) par held per strategy
+    strategy_mask: np.ndarray   # (n_cusips, n_words) uint64 bitmask of strategies holding each CUSIP
+    ig_owned: np.ndarray
+    ig_strategies: np.ndarray   # ', '.join of sorted IG strategies, None when not owned
+    hy_owned: np.ndarray
+
+    def lookup(self, cusips):
+        """Row of each CUSIP in the index, -1 where it is not held."""
+        return self.cusips.get_indexer(np.asarray(cusips))
+
+    def mask_to_names(self, mask):
+        return _mask_names(self.strategies, mask)
+
+
+def _mask_names(strategies, mask):
+    words = np.atleast_1d(mask)
+    return [s for i, s in enumerate(strategies) if int(words[i // WORD_BITS]) >> (i % WORD_BITS) & 1]
+
+
+def build_ownership_index(df_positions):
+    #for this data SHARE_PAR_VALUE used yo be PRICE_SOD
+    df_positions = df_positions.loc[:, ~df_positions.columns.duplicated()]
+    df_positions = df_positions.dropna(subset=['CUSIP'])
+    cusip_codes, cusips = pd.factorize(df_positions['CUSIP'].astype(str), sort=True)
+    strategy = df_positions['CRD_STRATEGY'].fillna('').astype(str)
+    strategy_codes, strategies = pd.factorize(strategy, sort=True)
+    n_cusips, n_strategies = len(cusips), len(strategies)
+
+    par_values = pd.to_numeric(df_positions['SHARE_PAR_VALUE'], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+    flat = cusip_codes * n_strategies + strategy_codes
+    par = np.bincount(flat, weights=par_values, minlength=n_cusips * n_strategies).reshape(n_cusips, n_strategies)
+    held = np.bincount(flat, minlength=n_cusips * n_strategies).reshape(n_cusips, n_strategies) > 0
+
+    n_words = max(1, -(-n_strategies // WORD_BITS))
+    word = np.arange(n_strategies) // WORD_BITS
+    bit_values = np.left_shift(np.uint64(1), (np.arange(n_strategies) % WORD_BITS).astype(np.uint64))
+    strategy_mask = np.zeros((n_cusips, n_words), dtype=np.uint64)
+    for w in range(n_words):
+        cols = word == w
+        strategy_mask[:, w] = (held[:, cols] * bit_values[cols]).sum(axis=1, dtype=np.uint64)
+
+    # --- IG rule: excluded strategies dropped, par > 2mm ---
+    ig_cols = ~strategies.isin(IG_EXCLUDED_STRATEGIES + [''])
+    ig_bits = np.array([bit_values[ig_cols & (word == w)].sum(dtype=np.uint64) for w in range(n_words)],
+                       dtype=np.uint64)
+    ig_mask = strategy_mask & ig_bits
+    ig_owned = (ig_mask != 0).any(axis=1) & (par[:, ig_cols].sum(axis=1) > IG_MIN_PAR)
+    # Few distinct strategy combinations exist, so each label is built once.
+    uniq, inverse = np.unique(ig_mask, axis=0, return_inverse=True)
+    labels = np.array([', '.join(_mask_names(strategies, m)) for m in uniq], dtype=object)
+    ig_strategies = np.where(ig_owned, labels[inverse.ravel()], None)
+
+    return OwnershipIndex(
+        cusips=cusips,
+        strategies=strategies,
+        par=par,
+        strategy_mask=strategy_mask,
+        ig_owned=ig_owned,
+        ig_strategies=ig_strategies,
+        hy_owned=np.ones(n_cusips, dtype=bool),
+    )
+
+
+def apply_ownership(df_bonds, index, rule):
+    """Add ``Own?`` (and for IG ``all_possible_strategies``) to ``df_bonds``."""
+    pos = index.lookup(df_bonds['CUSIP'].astype(str))
+    owned = np.zeros(len(pos), dtype=bool)
+    strategies = np.full(len(pos), None, dtype=object)
+    found = np.flatnonzero(pos >= 0)
+    if rule == 'ig':
+        owned[found] = index.ig_owned[pos[found]]
+        strategies[found] = index.ig_strategies[pos[found]]
+    else:
+        owned[found] = index.hy_owned[pos[found]]
+    df_bonds = df_bonds.copy()
+    if rule == 'ig':
+        df_bonds['all_possible_strategies'] = strategies
+    df_bonds['Own?'] = np.where(owned, 'Y', 'N')
+    return df_bonds
@@ -0,0 +1,41 @@
+"""Server-side filtering, sorting and paging of trade tables.
+
+The Curve page sends the browser one page of the universe trade table at a
+time, so the payload stays the same size however many signals qualify.
+"""
+import numpy as np
+import pandas as pd
+
+PAGE_SIZES = (25, 50, 100, 250)
+
+
+def filter_rows(df, text):
+    """Rows where any text column contains ``text`` (case-insensitive)."""
+    if not text:
+        return df
+    mask = np.zeros(len(df), dtype=bool)
+    for col in df.columns:
+        if not pd.api.types.is_numeric_dtype(df[col]):
+            mask |= df[col].astype(str).str.contains(text, case=False, regex=False).to_numpy(dtype=bool)
+    return df[mask]
+
+
+def page_table(df, text='', sort_by=None, ascending=True, page=1, page_size=PAGE_SIZES[0]):
+    """``(page_frame, matching_rows, n_pages)`` for the requested view of ``df``.
+
+    ``sort_by=None`` keeps the table's own order.  ``page`` is 1-based and
+    clamped to the available pages.
+    """
+    view = filter_rows(df, text)
+    total = len(view)
+    n_pages = max(1, -(-total // page_size))
+    page = min(max(1, int(page)), n_pages)
+    start = (page - 1) * page_size
+    if sort_by is None:
+        rows = view.iloc[start:start + page_size]
+    else:
+        # Sort only the key column; just the page's rows are taken from the table.
+        key = view[sort_by].reset_index(drop=True)
+        order = key.sort_values(ascending=ascending, kind='stable').index.to_numpy()
+        rows = view.iloc[order[start:start + page_size]]
+    return rows.reset_index(drop=True), total, n_pages
@@ -0,0 +1,201 @@
+"""Process-pool execution of the per-ticker NS fits and pair scans.
+
+Fits and pair scans never mix tickers, so ``TickerExecutor`` splits the
+tickers into chunks balanced by size (largest ticker first into the lightest
+chunk), copies the input columns once into shared memory, and has each
+worker process fit or scan one contiguous slice of it.  Results are merged
+back into exactly the order the serial ``fit_ns_batch`` and ``find_pairs``
+produce, so the output does not depend on the worker count or on which
+chunk finishes first.
+
+``workers=1``, and inputs below ``min_rows``, run the serial functions
+in-process; the default keeps the app's small what-if scans off the pool,
+while the batch pipeline passes ``PIPELINE_MIN_ROWS`` so every segment uses
+it.  The executor's methods take the same arguments as those
+functions, so callers accept either an executor or ``None`` for serial.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from analytics.nelson_siegel import DEFAULT_LAMBDAS, fit_ns_batch
+from analytics.signals import find_pairs
+
+WORKERS_ENV = 'NS_APP_WORKERS'
+PARALLEL_MIN_ROWS = 10000
+PIPELINE_MIN_ROWS = 1
+CHUNKS_PER_WORKER = 2
+
+
+def balanced_chunks(weights, n_chunks):
+    """Chunk number for each group: heaviest group first into the lightest chunk."""
+    weights = np.asarray(weights, dtype=np.float64)
+    loads = np.zeros(n_chunks)
+    chunk = np.empty(len(weights), dtype=np.int64)
+    for g in np.argsort(-weights, kind='stable').tolist():
+        lightest = int(np.argmin(loads))
+        chunk[g] = lightest
+        loads[lightest] += weights[g]
+    return chunk
+
+
+class _SharedArrays:
+    """Named NumPy arrays copied into shared memory; ``specs`` lets workers attach to them."""
+
+    def __init__(self, arrays):
+        self._blocks = []
+        self.specs = {}
+        try:
+            for name, values in arrays.items():
+                values = np.ascontiguousarray(values)
+                block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+                self._blocks.append(block)
+                np.ndarray(values.shape, values.dtype, buffer=block.buf)[...] = values
+                self.specs[name] = (block.name, values.shape, values.dtype.str)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _attach(specs):
+    blocks, arrays = [], {}
+    for name, (block_name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        arrays[name] = np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+    return blocks, arrays
+
+
+def _fit_chunk(specs, start, stop, method, lambdas, polish, polish_maxfev):
+    blocks, arrays = _attach(specs)
+    try:
+        sl = slice(start, stop)
+        return fit_ns_batch(arrays['codes'][sl], arrays['x'][sl], arrays['y'][sl], method=method,
+                            lambdas=lambdas, polish=polish, polish_maxfev=polish_maxfev)
+    finally:
+        del arrays
+        for block in blocks:
+            block.close()
+
+
+def _scan_chunk(specs, start, stop, ratio_cutoff):
+    blocks, arrays = _attach(specs)
+    try:
+        sl = slice(start, stop)
+        pairs = find_pairs(arrays['codes'][sl], arrays['dur'][sl], arrays['oas'][sl], arrays['owned'][sl],
+                           arrays['candidates'][sl], ratio_cutoff)
+        return pairs['owned'].to_numpy() + start, pairs['matched'].to_numpy() + start, pairs['ratio'].to_numpy()
+    finally:
+        del arrays
+        for block in blocks:
+            block.close()
+
+
+class TickerExecutor:
+    """Runs ``fit_ns_batch`` / ``find_pairs`` over balanced ticker chunks on ``workers`` processes."""
+
+    def __init__(self, workers=None, min_rows=PARALLEL_MIN_ROWS, chunks_per_worker=CHUNKS_PER_WORKER):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.min_rows = min_rows
+        self.chunks_per_worker = chunks_per_worker
+        self._pool = None
+
+    def _parallel(self, n_rows):
+        return self.workers > 1 and n_rows >= self.min_rows
+
+    def _get_pool(self):
+        if self._pool is None:
+            # Spawned, not forked: the app calls this from a threaded server.
+            self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                             mp_context=multiprocessing.get_context('spawn'))
+        return self._pool
+
+    def _chunks(self, codes, weights):
+        """Row order grouping each chunk's rows (original order within), and the chunk bounds."""
+        chunk = balanced_chunks(weights, min(self.workers * self.chunks_per_worker, len(weights)))
+        order = np.argsort(chunk[codes], kind='stable')
+        bounds = np.r_[0, np.cumsum(np.bincount(chunk[codes], minlength=int(chunk.max()) + 1))]
+        return order, [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+    def fit_ns_batch(self, tickers, x, y, method='profiled', lambdas=DEFAULT_LAMBDAS, polish=False,
+                     polish_maxfev=200):
+        """``fit_ns_batch`` with the tickers fitted in parallel chunks; identical output."""
+        tickers = np.asarray(tickers)
+        if not self._parallel(len(tickers)):
+            return fit_ns_batch(tickers, x, y, method=method, lambdas=lambdas, polish=polish,
+                                polish_maxfev=polish_maxfev)
+        codes, uniques = pd.factorize(tickers)
+        order, bounds = self._chunks(codes, np.bincount(codes, minlength=len(uniques)))
+        grid = np.asarray(lambdas, dtype=np.float64)
+        arrays = {'codes': codes[order], 'x': np.asarray(x, dtype=np.float64)[order],
+                  'y': np.asarray(y, dtype=np.float64)[order]}
+        with _SharedArrays(arrays) as shared:
+            futures = []
+            for start, stop in bounds:
+                # Per-ticker grids are in first-appearance order, which is code order within a chunk too.
+                chunk_grid = grid if grid.ndim == 1 else grid[np.unique(arrays['codes'][start:stop])]
+                futures.append(self._get_pool().submit(_fit_chunk, shared.specs, start, stop, method, chunk_grid,
+                                                       polish, polish_maxfev))
+            parts = [f.result() for f in futures]
+        fits = pd.concat(parts)
+        fits.index = pd.Index(uniques[fits.index.to_numpy()], name='TICKER')
+        return fits.reindex(pd.Index(uniques, name='TICKER'))
+
+    def find_pairs(self, tickers, dur, oas, owned, candidates, ratio_cutoff):
+        """``find_pairs`` with the tickers scanned in parallel chunks; identical output."""
+        tickers = np.asarray(tickers)
+        if not self._parallel(len(tickers)):
+            return find_pairs(tickers, dur, oas, owned, candidates, ratio_cutoff)
+        codes, uniques = pd.factorize(tickers)
+        owned = np.asarray(owned, dtype=bool)
+        candidates = np.asarray(candidates, dtype=bool)
+        # Scan cost grows with owned x candidate bonds per ticker.
+        weights = (np.bincount(codes, weights=owned, minlength=len(uniques))
+                   * np.bincount(codes, weights=candidates, minlength=len(uniques)))
+        order, bounds = self._chunks(codes, weights + 1)
+        arrays = {'codes': codes[order], 'dur': np.asarray(dur, dtype=np.float64)[order],
+                  'oas': np.asarray(oas, dtype=np.float64)[order], 'owned': owned[order],
+                  'candidates': candidates[order]}
+        with _SharedArrays(arrays) as shared:
+            futures = [self._get_pool().submit(_scan_chunk, shared.specs, start, stop, ratio_cutoff)
+                       for start, stop in bounds]
+            parts = [f.result() for f in futures]
+        left = order[np.concatenate([p[0] for p in parts])]
+        right = order[np.concatenate([p[1] for p in parts])]
+        ratio = np.concatenate([p[2] for p in parts])
+        # Same order as the serial scan: ticker, owned row, candidate row.
+        merged = np.lexsort((right, left, codes[left]))
+        return pd.DataFrame({'owned': left[merged], 'matched': right[merged], 'ratio': ratio[merged]})
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def executor_from_env():
+    """A ``TickerExecutor`` sized by ``NS_APP_WORKERS`` (``None``, i.e. serial, if unset)."""
+    workers = os.environ.get(WORKERS_ENV)
+    return TickerExecutor(int(workers)) if workers else None
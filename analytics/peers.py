@@ -0,0 +1,241 @@
+"""Peer z-scores and rolling per-bond history for the "Z-Score of Peers" page.
+
+``peer_zscores`` buckets bonds by a peer key (ticker, or sector/rating when
+the source carries them) crossed with a duration bucket and scores each
+bond's OAS and NS deviation against its bucket, using ``np.bincount``
+segment reductions rather than a loop over groups.
+
+``PeerHistory`` keeps each day's (OAS, deviation) per CUSIP in SQLite next
+to Welford running statistics over the last ``window`` recorded days.
+Adding a day folds in the new rows and removes the day leaving the window,
+so it costs O(rows of those two days) rather than a pass over the history.
+``stats(before=...)`` removes the window's latest days the same way, so a
+day's values are never scored against a history that already contains them.
+"""
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+PEER_KEYS = ('TICKER', 'SECTOR', 'RATING')
+DURATION_EDGES = (2.0, 5.0, 10.0, 20.0)
+MIN_PEERS = 3
+HISTORY_WINDOW_DAYS = 20
+PEER_HISTORY_ENV = 'NS_APP_PEER_HISTORY'
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS peer_daily (
+        segment TEXT NOT NULL,
+        as_of TEXT NOT NULL,
+        cusip TEXT NOT NULL,
+        oas REAL,
+        deviation REAL,
+        PRIMARY KEY (segment, as_of, cusip)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS peer_stats (
+        segment TEXT NOT NULL,
+        cusip TEXT NOT NULL,
+        n_oas INTEGER, mean_oas REAL, m2_oas REAL,
+        n_dev INTEGER, mean_dev REAL, m2_dev REAL,
+        PRIMARY KEY (segment, cusip)
+    )
+    """,
+)
+_STAT_COLUMNS = ['n_oas', 'mean_oas', 'm2_oas', 'n_dev', 'mean_dev', 'm2_dev']
+
+
+def available_peer_keys(df):
+    return [key for key in PEER_KEYS if key in df.columns]
+
+
+def duration_buckets(dur, edges=DURATION_EDGES):
+    """Bucket codes and labels (``<2``, ``2-5``, ..., ``20+``) for durations."""
+    codes = np.searchsorted(np.asarray(edges, dtype=np.float64), np.asarray(dur, dtype=np.float64), side='right')
+    labels = [f"<{edges[0]:g}"] + [f"{lo:g}-{hi:g}" for lo, hi in zip(edges[:-1], edges[1:])] + [f"{edges[-1]:g}+"]
+    return codes, labels
+
+
+def _group_zscore(groups, n_groups, values, min_peers):
+    """Z-score of ``values`` within ``groups`` (sample std); NaN for small or flat groups."""
+    values = np.asarray(values, dtype=np.float64)
+    valid = np.isfinite(values)
+    count = np.bincount(groups[valid], minlength=n_groups)
+    mean = np.bincount(groups[valid], weights=values[valid], minlength=n_groups) / np.maximum(count, 1)
+    # Two-pass variance: centre first so large spreads do not cancel.
+    centred = values - mean[groups]
+    ss = np.bincount(groups[valid], weights=centred[valid] ** 2, minlength=n_groups)
+    std = np.sqrt(ss / np.maximum(count - 1, 1))
+    ok = (count[groups] >= min_peers) & (std[groups] > 0) & valid
+    z = np.full(len(values), np.nan)
+    z[ok] = centred[ok] / std[groups][ok]
+    return z, count[groups]
+
+
+def peer_zscores(df, key='TICKER', edges=DURATION_EDGES, min_peers=MIN_PEERS):
+    """Per-bond peer bucket, bucket size and OAS / NS-deviation z-scores, aligned to ``df``.
+
+    ``DEV_Z`` is only present when ``df`` has a ``Deviation`` column (IG).
+    """
+    column = df[key]
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        key_codes = column.cat.codes.to_numpy()
+    else:
+        key_codes, _ = pd.factorize(column.to_numpy())
+    bucket, labels = duration_buckets(df['DURADJMOD'], edges)
+    n_buckets = len(labels)
+    groups = key_codes.astype(np.int64) * n_buckets + bucket
+    n_groups = int(groups.max()) + 1 if len(groups) else 0
+    out = pd.DataFrame({'PEER_GROUP': column.to_numpy(),
+                        'DUR_BUCKET': pd.Categorical.from_codes(bucket, labels)}, index=df.index)
+    out['OAS_Z'], out['PEERS'] = _group_zscore(groups, n_groups, df['OAS_BP'], min_peers)
+    if 'Deviation' in df:
+        out['DEV_Z'], _ = _group_zscore(groups, n_groups, df['Deviation'], min_peers)
+    return out
+
+
+def _welford_add(n, mean, m2, x):
+    valid = np.isfinite(x)
+    n_new = n + valid
+    delta = np.where(valid, x - mean, 0.0)
+    mean_new = mean + np.where(valid, delta / np.maximum(n_new, 1), 0.0)
+    m2_new = m2 + np.where(valid, delta * (x - mean_new), 0.0)
+    return n_new, mean_new, m2_new
+
+
+def _welford_remove(n, mean, m2, x):
+    valid = np.isfinite(x) & (n > 0)
+    n_new = n - valid
+    mean_new = np.where(valid & (n_new > 0), (n * mean - np.where(valid, x, 0.0)) / np.maximum(n_new, 1), mean)
+    m2_new = np.where(valid, m2 - np.where(valid, (x - mean_new) * (x - mean), 0.0), m2)
+    empty = n_new == 0
+    # Clamp rounding drift; an emptied accumulator starts again from zero.
+    return n_new, np.where(empty, 0.0, mean_new), np.where(empty, 0.0, np.maximum(m2_new, 0.0))
+
+
+def _fold(stats, rows, update):
+    """``stats`` with each of ``rows``' (cusip, oas, deviation) added or removed by ``update``."""
+    pos = stats.index.get_indexer(rows['cusip'])
+    found = pos >= 0
+    for value, prefix in (('oas', 'oas'), ('deviation', 'dev')):
+        cols = [f'n_{prefix}', f'mean_{prefix}', f'm2_{prefix}']
+        x = np.full(len(stats), np.nan)
+        x[pos[found]] = rows[value].to_numpy(dtype=np.float64)[found]
+        stats[cols] = np.column_stack(update(*(stats[c].to_numpy() for c in cols), x))
+    return stats
+
+
+class PeerHistory:
+    """Daily per-CUSIP history with rolling Welford statistics, stored in SQLite."""
+
+    def __init__(self, path, window=HISTORY_WINDOW_DAYS):
+        self.path = path
+        self.window = window
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            for statement in _SCHEMA:
+                conn.execute(statement)
+
+    def _connect(self):
+        return sqlite3.connect(self.path)
+
+    def days(self, segment):
+        with self._connect() as conn:
+            return self._days(conn, segment)
+
+    @staticmethod
+    def _days(conn, segment):
+        rows = conn.execute("SELECT DISTINCT as_of FROM peer_daily WHERE segment = ? ORDER BY as_of", (segment,))
+        return [r[0] for r in rows]
+
+    @staticmethod
+    def _day_rows(conn, segment, as_of):
+        return pd.read_sql("SELECT cusip, oas, deviation FROM peer_daily WHERE segment = ? AND as_of = ?",
+                           conn, params=(segment, as_of))
+
+    def add_day(self, segment, as_of, bonds):
+        """Record ``bonds`` (CUSIP, OAS_BP[, Deviation]) for ``as_of``; returns ``False`` if already recorded.
+
+        Days must be added in date order.
+        """
+        as_of = str(as_of)
+        with self._lock, self._connect() as conn:
+            days = self._days(conn, segment)
+            if as_of in days:
+                return False
+            if days and as_of < days[-1]:
+                raise ValueError(f"{segment} history already runs to {days[-1]}; cannot add {as_of}")
+            new = pd.DataFrame({
+                'cusip': bonds['CUSIP'].astype(str).to_numpy(),
+                'oas': bonds['OAS_BP'].to_numpy(dtype=np.float64),
+                'deviation': (bonds['Deviation'].to_numpy(dtype=np.float64) if 'Deviation' in bonds
+                              else np.full(len(bonds), np.nan)),
+            }).drop_duplicates('cusip', keep='last')
+            values = new[['oas', 'deviation']]
+            values = values.astype(object).where(np.isfinite(values), None).to_numpy().tolist()
+            conn.executemany("INSERT INTO peer_daily VALUES (?, ?, ?, ?, ?)",
+                             [(segment, as_of, c, o, d) for c, (o, d) in zip(new['cusip'].tolist(), values)])
+
+            # The day that leaves the window once this one is in.
+            expired = pd.DataFrame(columns=['cusip', 'oas', 'deviation'])
+            if len(days) + 1 > self.window:
+                expired = self._day_rows(conn, segment, days[len(days) - self.window])
+
+            cusips = pd.Index(pd.concat([new['cusip'], expired['cusip']]).unique())
+            stats = self._read_stats(conn, segment).reindex(cusips)
+            stats[['n_oas', 'n_dev']] = stats[['n_oas', 'n_dev']].fillna(0).astype(np.int64)
+            stats = stats.fillna(0.0)
+            stats = _fold(_fold(stats, expired, _welford_remove), new, _welford_add)
+            conn.executemany("INSERT OR REPLACE INTO peer_stats VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                             [(segment, c, *r) for c, r in zip(cusips.tolist(), stats[_STAT_COLUMNS].astype(object)
+                                                                         .to_numpy().tolist())])
+        return True
+
+    @staticmethod
+    def _read_stats(conn, segment):
+        df = pd.read_sql(f"SELECT cusip, {', '.join(_STAT_COLUMNS)} FROM peer_stats WHERE segment = ?",
+                         conn, params=(segment,))
+        return df.set_index('cusip')
+
+    def stats(self, segment, before=None):
+        """Rolling ``OAS_MEAN/OAS_STD/DEV_MEAN/DEV_STD`` and day counts, indexed by CUSIP.
+
+        ``before`` (an as-of date) leaves out the window's days on or after it,
+        e.g. today's, so today's values are scored against earlier days only.
+        """
+        with self._connect() as conn:
+            df = self._read_stats(conn, segment)
+            if before is not None:
+                for day in self._days(conn, segment)[-self.window:]:
+                    if day >= str(before):
+                        df = _fold(df, self._day_rows(conn, segment, day), _welford_remove)
+        out = pd.DataFrame(index=df.index)
+        for prefix, name in (('oas', 'OAS'), ('dev', 'DEV')):
+            n = df[f'n_{prefix}'].to_numpy(dtype=np.float64)
+            out[f'{name}_DAYS'] = df[f'n_{prefix}'].astype(np.int64)
+            out[f'{name}_MEAN'] = np.where(n > 0, df[f'mean_{prefix}'], np.nan)
+            out[f'{name}_STD'] = np.sqrt(np.where(n > 1, df[f'm2_{prefix}'] / np.maximum(n - 1, 1), np.nan))
+        return out
+
+
+def history_zscores(bonds, stats):
+    """Today's OAS / deviation against each bond's own rolling history (``OAS_HZ``, ``DEV_HZ``)."""
+    aligned = stats.reindex(bonds['CUSIP'].astype(str).to_numpy())
+    out = pd.DataFrame(index=bonds.index)
+    for col, name in (('OAS_BP', 'OAS'), ('Deviation', 'DEV')):
+        if col not in bonds:
+            continue
+        std = aligned[f'{name}_STD'].to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z = (bonds[col].to_numpy(dtype=np.float64) - aligned[f'{name}_MEAN'].to_numpy()) / std
+        out[f'{name}_HZ'] = np.where(std > 0, z, np.nan)
+    return out
+
+
+def peer_history_from_env():
+    path = os.environ.get(PEER_HISTORY_ENV)
+    return PeerHistory(path) if path else None
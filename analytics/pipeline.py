@@ -0,0 +1,180 @@
+"""Headless Curve pipeline: load, process, fit and generate signals.
+
+Runs the IG and HY segments against a local Parquet/SQLite copy of the
+source tables and writes fitted parameters, bond deviations, universe
+signals and the app's what-if pair indexes to Parquet.  Both segments share
+one process pool that fits and scans balanced chunks of tickers
+(``--workers``, one per core by default), so a full recompute scales with
+the host rather than with the two segments.  Signals are streamed to disk a
+chunk of tickers at a time, optionally keeping only the top-K matches per
+owned bond (``--top-k``), and each run can be recorded in the peer z-score
+history (``--peer-history``).  The app can serve that output, pair indexes
+included, instead of recomputing it (see ``NS_APP_PRECOMPUTED_DIR``).
+
+    python -m analytics.pipeline --data /path/to/sources --out /path/to/output
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from datetime import date
+from functools import partial
+
+import pandas as pd
+
+from analytics.export import write_chunks
+from analytics.instrumentation import StageTimer
+from analytics.loaders import local_backend
+from analytics.ownership import build_ownership_index
+from analytics.parallel import PIPELINE_MIN_ROWS, TickerExecutor
+from analytics.param_store import ParamStore
+from analytics.peers import PeerHistory
+from analytics.processing import IG_DEVIATION_THRESHOLD, build_hy, build_ig
+from analytics.signals import (PairIndex, hy_pair_index, hy_universe_tables, ig_pair_index, ig_universe_tables,
+                               iter_pair_index_frames)
+from analytics.snapshot import SEGMENTS, AnalyticsSnapshot, OwnershipCache, SnapshotStore, build_derived
+from analytics.sources import SOURCES
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = 'manifest.json'
+PAIR_INDEX_FUNCTIONS = {'ig': ig_pair_index, 'hy': hy_pair_index}
+PRECOMPUTED_DIR_ENV = 'NS_APP_PRECOMPUTED_DIR'
+
+
+def build_segment(segment, raw_bonds, raw_positions, param_store=None, as_of=None, executor=None,
+                  ownership_cache=None):
+    """Processed frames for one segment as ``{'bonds'[, 'fits']}``; signals are streamed separately."""
+    ownership = (build_ownership_index(raw_positions) if ownership_cache is None
+                 else ownership_cache.get(raw_positions))
+    if segment == 'ig':
+        bonds, fits, _ = build_ig(raw_bonds, ownership, param_store=param_store, as_of=as_of,
+                                  universe_signals=False, executor=executor)
+        return {'bonds': bonds, 'fits': fits}
+    bonds, _ = build_hy(raw_bonds, ownership, universe_signals=False, executor=executor)
+    return {'bonds': bonds}
+
+
+def universe_tables(segment, bonds, top_k=None, executor=None):
+    """The segment's universe trade table as a stream of chunks."""
+    if segment == 'ig':
+        return ig_universe_tables(bonds, IG_DEVIATION_THRESHOLD, top_k=top_k, executor=executor)
+    return hy_universe_tables(bonds, top_k=top_k, executor=executor)
+
+
+def run_segment(segment, data_path, out_dir, param_store_path=None, as_of=None, top_k=None,
+                peer_history_path=None, executor=None, ownership_cache=None):
+    """Load one segment from ``data_path``, process it and write its Parquet files."""
+    started = time.perf_counter()
+    backend = local_backend(data_path)
+    param_store = ParamStore(param_store_path) if param_store_path else None
+    frames = build_segment(segment, backend.read(SOURCES[segment]), backend.read(SOURCES['positions']),
+                           param_store, as_of, executor, ownership_cache)
+    for name, df in frames.items():
+        df.to_parquet(os.path.join(out_dir, f"{segment}_{name}.parquet"), index=(name == 'fits'))
+    rows = {name: len(df) for name, df in frames.items()}
+    if peer_history_path:
+        PeerHistory(peer_history_path).add_day(segment, as_of or date.today().isoformat(), frames['bonds'])
+    rows['trades'] = write_chunks(universe_tables(segment, frames['bonds'], top_k, executor),
+                                  os.path.join(out_dir, f"{segment}_trades.parquet"), 'parquet')
+    # Stored so the app serves the what-if tables without rescanning the bonds.
+    rows['pair_index'] = write_chunks(iter_pair_index_frames(frames['bonds'], PAIR_INDEX_FUNCTIONS[segment],
+                                                             executor=executor),
+                                      os.path.join(out_dir, f"{segment}_pair_index.parquet"), 'parquet')
+    logger.info("%s segment done in %.2fs: %s", segment.upper(), time.perf_counter() - started, rows)
+    return segment, rows
+
+
+def run(data_path, out_dir, segments=SEGMENTS, workers=None, param_store_path=None, as_of=None, top_k=None,
+        peer_history_path=None):
+    """Run ``segments`` and write the manifest.
+
+    Fits and scans run on ``workers`` processes (one per core by default),
+    however small the segment; ``workers=1`` runs everything in this process.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    ownership_cache = OwnershipCache()
+    with TickerExecutor(workers, min_rows=PIPELINE_MIN_ROWS) as executor:
+        results = [run_segment(segment, data_path, out_dir, param_store_path, as_of, top_k, peer_history_path,
+                               executor, ownership_cache) for segment in segments]
+    manifest = {'built_at': time.time(), 'segments': dict(results)}
+    # The manifest is written last, so readers only see complete output.
+    tmp = os.path.join(out_dir, MANIFEST + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp, os.path.join(out_dir, MANIFEST))
+    return manifest
+
+
+def output_version(out_dir):
+    """Version of the precomputed output: its manifest build time."""
+    with open(os.path.join(out_dir, MANIFEST)) as f:
+        return str(json.load(f)['built_at'])
+
+
+def load_output(out_dir, version=None, timer=None, segments=SEGMENTS):
+    """Read ``segments`` of the pipeline output back as an ``AnalyticsSnapshot``.
+
+    The stored pair indexes are used as written; output from before they were
+    stored has its pairs rescanned from the bonds.
+    """
+    timer = timer or StageTimer()
+
+    def read(name):
+        with timer.stage(f'read.{name}') as s:
+            df = pd.read_parquet(os.path.join(out_dir, f"{name}.parquet"))
+            s['rows'] = len(df)
+        return df
+
+    version = version or output_version(out_dir)
+    fields, bonds, pair_indexes = {}, {}, {}
+    for segment in segments:
+        bonds[segment] = read(f'{segment}_bonds')
+        if segment == 'ig':
+            fields['ig_fits'] = read('ig_fits')
+        if os.path.exists(os.path.join(out_dir, f"{segment}_pair_index.parquet")):
+            pair_indexes[segment] = PairIndex.from_frame(read(f'{segment}_pair_index'))
+    return AnalyticsSnapshot(
+        version=version,
+        built_at=float(version),
+        **fields,
+        **build_derived(bonds.get('ig'), bonds.get('hy'), timer, pair_indexes=pair_indexes),
+    )
+
+
+def precomputed_store(out_dir, interval=60, segments=SEGMENTS):
+    """A ``SnapshotStore`` that serves pipeline output and picks up new runs."""
+    return SnapshotStore(lambda: out_dir, interval=interval, version=output_version,
+                         build=partial(load_output, segments=segments))
+
+
+def precomputed_store_from_env(segments=SEGMENTS):
+    out_dir = os.environ.get(PRECOMPUTED_DIR_ENV)
+    return precomputed_store(out_dir, segments=segments) if out_dir else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the IG/HY Curve universe scan.")
+    parser.add_argument('--data', required=True, help="Directory of <table>.parquet files or a SQLite file")
+    parser.add_argument('--out', required=True, help="Output directory for the Parquet results")
+    parser.add_argument('--segment', choices=SEGMENTS, action='append',
+                        help="Segment to run (repeatable); defaults to both")
+    parser.add_argument('--workers', type=int, default=None, help="Processes for fitting and scanning (default: one per core); 1 runs serially")
+    parser.add_argument('--param-store', help="SQLite NS parameter history for warm-started fits")
+    parser.add_argument('--as-of', help="As-of date for the parameter history (default: today)")
+    parser.add_argument('--top-k', type=int, default=None,
+                        help="Keep only the K highest-ratio matches per owned bond (default: all)")
+    parser.add_argument('--peer-history', help="SQLite peer z-score history to record this run's day in")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s %(message)s')
+    manifest = run(args.data, args.out, tuple(args.segment or SEGMENTS), args.workers,
+                   args.param_store, args.as_of, args.top_k, args.peer_history)
+    print(json.dumps(manifest['segments']))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
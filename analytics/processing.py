@@ -0,0 +1,94 @@
+"""Bond processing for the IG and HY Curve tabs."""
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from analytics.instrumentation import StageTimer
+from analytics.nelson_siegel import fit_ns_batch, fitted_values
+from analytics.ownership import apply_ownership
+from analytics.param_store import incremental_fit
+from analytics.signals import hy_pairs, hy_trade_table, ig_pairs, ig_trade_table
+
+IG_DEVIATION_THRESHOLD = 5
+HY_DEVIATION_THRESHOLD = 10
+IG_MIN_BONDS_PER_TICKER = 5
+
+
+# --- Process Bloomberg Data ---
+def prepare_bonds(df_bonds, min_bonds_per_ticker=None):
+    df_bonds = df_bonds.copy()
+    df_bonds['TICKER'] = df_bonds['TICKER'].astype(str)
+    df_bonds['COUPON'] = df_bonds['COUPON'].astype(str)
+    df_bonds['MATURDATE'] = pd.to_datetime(df_bonds['MATURDATE'], format='%Y%m%d').dt.strftime('%m/%d/%Y')
+    df_bonds.insert(3, 'ID', df_bonds['TICKER'] + ' ' + df_bonds['COUPON'] + ' ' + df_bonds['MATURDATE'])
+    df_bonds['DURADJMOD'] = pd.to_numeric(df_bonds['DURADJMOD'], errors='coerce')
+    df_bonds['OAS_BP'] = pd.to_numeric(df_bonds['OAS_BP'], errors='coerce')
+    df_bonds = df_bonds.dropna(subset=['DURADJMOD', 'OAS_BP'])
+
+    # Remove low-frequency tickers
+    if min_bonds_per_ticker:
+        df_bonds = df_bonds[df_bonds['TICKER'].map(df_bonds['TICKER'].value_counts()) >= min_bonds_per_ticker]
+    return df_bonds
+
+
+def add_ns_deviation(df_bonds, fits):
+    df_bonds['NS_FIT'] = fitted_values(fits, df_bonds['TICKER'], df_bonds['DURADJMOD'])
+    df_bonds['Deviation'] = df_bonds['OAS_BP'] - df_bonds['NS_FIT']
+    df_bonds['Above/Below'] = np.where(df_bonds['Deviation'] > 0, 'Above', 'Below')
+    return df_bonds
+
+
+def _ns_fitter(executor):
+    return fit_ns_batch if executor is None else executor.fit_ns_batch
+
+
+def build_ig(raw_bonds, ownership, deviation_threshold=IG_DEVIATION_THRESHOLD,
+             ns_fit_method='profiled', ns_fit_polish=False, timer=None, param_store=None, as_of=None,
+             universe_signals=True, executor=None):
+    """IG bonds with NS deviations, per-ticker fits and the universe trade table.
+
+    With a ``param_store`` the fits reuse or warm-start from the stored history
+    and are saved under ``as_of`` (today by default).  ``universe_signals=False``
+    skips the trade table (returned as ``None``) for callers that stream it.
+    An ``executor`` (``analytics.parallel``) fits and scans tickers in parallel.
+    """
+    timer = timer or StageTimer()
+    with timer.stage('ig.prepare') as s:
+        df_bonds = prepare_bonds(raw_bonds, IG_MIN_BONDS_PER_TICKER)
+        s['rows'] = len(df_bonds)
+    with timer.stage('ig.ownership', rows=len(df_bonds)):
+        df_bonds = apply_ownership(df_bonds, ownership, 'ig')
+    with timer.stage('ig.fit') as s:
+        if param_store is not None:
+            fits = incremental_fit(df_bonds['TICKER'], df_bonds['DURADJMOD'], df_bonds['OAS_BP'], param_store,
+                                   'ig', as_of or date.today().isoformat(), polish=ns_fit_polish,
+                                   executor=executor)
+        else:
+            fits = _ns_fitter(executor)(df_bonds['TICKER'], df_bonds['DURADJMOD'], df_bonds['OAS_BP'],
+                                        method=ns_fit_method, polish=ns_fit_polish)
+        s['rows'] = len(fits)
+    with timer.stage('ig.deviation', rows=len(df_bonds)):
+        df_bonds = add_ns_deviation(df_bonds, fits)
+    trades = None
+    if universe_signals:
+        with timer.stage('ig.signals') as s:
+            trades = ig_trade_table(df_bonds, ig_pairs(df_bonds, deviation_threshold, executor=executor), universe=True)
+            s['rows'] = len(trades)
+    return df_bonds, fits, trades
+
+
+def build_hy(raw_bonds, ownership, timer=None, universe_signals=True, executor=None):
+    """HY bonds with ownership and the universe trade table (``None`` if not ``universe_signals``)."""
+    timer = timer or StageTimer()
+    with timer.stage('hy.prepare') as s:
+        df_bonds = prepare_bonds(raw_bonds)
+        s['rows'] = len(df_bonds)
+    with timer.stage('hy.ownership', rows=len(df_bonds)):
+        df_bonds = apply_ownership(df_bonds, ownership, 'hy')
+    trades = None
+    if universe_signals:
+        with timer.stage('hy.signals') as s:
+            trades = hy_trade_table(df_bonds, hy_pairs(df_bonds, universe=True, executor=executor), universe=True)
+            s['rows'] = len(trades)
+    return df_bonds, trades
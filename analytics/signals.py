@@ -0,0 +1,448 @@
+"""Columnar pair-trade signal engine.
+
+A signal pairs an owned bond with a longer-duration bond of the same ticker
+whose extra spread per unit of extra duration clears a ratio cutoff.  All
+pairs for every ticker are produced in one pass of NumPy array operations
+and come back in the same order the old nested ``iterrows`` loops emitted
+them: ticker by first appearance, then owned row, then candidate row.
+
+``iter_universe_tables`` streams the universe table in chunks of whole
+tickers, optionally keeping only the top-K matches per owned bond, so
+exports need memory for one chunk rather than every qualifying pair.
+
+A ``PairIndex`` holds the bond positions, ratios and deviations of every
+pair that can qualify anywhere in the sidebar's threshold/cutoff ranges, so a
+what-if setting is answered by a binary search on the ratio and a mask on the
+deviations instead of a rescan.  IDs, CUSIPs and strategies are only built,
+from the ``BondUniverse``, for the pairs a setting selects.
+``iter_pair_index_frames`` streams an index, a chunk of whole tickers at a
+time, as frames that ``PairIndex.from_frame`` reads back, which is how the
+pipeline hands finished indexes to the app.
+
+Pairs never cross tickers and every ID starts with its ticker and a space,
+so a ticker's pairs form one contiguous block of a universe-ordered index.
+``PairIndex.replace_tickers`` swaps those blocks for re-scanned ones, which
+is how intraday updates avoid a full rescan.
+
+The scanning functions take an optional ``executor`` (see
+``analytics.parallel``) that runs ``find_pairs`` over ticker chunks on a
+process pool; the output is the same either way.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+IG_RATIO_CUTOFF = 12
+HY_RATIO_CUTOFF = 20
+# What-if ranges covered by the pair indexes (deviation threshold in percent of NS_FIT).
+IG_THRESHOLD_RANGE = (0.0, 20.0)
+RATIO_CUTOFF_FLOOR = 0.0
+DEFAULT_CHUNK_BONDS = 5000
+# PairIndex arrays stored by ``to_frame``; ``by_ratio`` is rebuilt.
+INDEX_ARRAYS = ('owned', 'matched', 'ratio', 'owned_dev', 'owned_fit', 'matched_dev', 'matched_fit')
+
+
+def find_pairs(tickers, dur, oas, owned, candidates, ratio_cutoff):
+    """Return qualifying (owned, matched) row positions and their OAS/Dur ratio.
+
+    ``owned`` and ``candidates`` are boolean masks over the rows.  A pair
+    qualifies when both rows share a ticker, the matched bond has strictly
+    longer duration and ``(oas_m - oas_o) / (dur_m - dur_o) > ratio_cutoff``.
+    """
+    codes, _ = pd.factorize(np.asarray(tickers))
+    codes = codes.astype(np.int64)
+    dur = np.asarray(dur, dtype=np.float64)
+    oas = np.asarray(oas, dtype=np.float64)
+    own_pos = np.flatnonzero(np.asarray(owned, dtype=bool))
+    cand_pos = np.flatnonzero(np.asarray(candidates, dtype=bool))
+    if len(own_pos) == 0 or len(cand_pos) == 0:
+        return pd.DataFrame({'owned': np.empty(0, np.int64),
+                             'matched': np.empty(0, np.int64),
+                             'ratio': np.empty(0, np.float64)})
+
+    # Sort candidates by (ticker, duration).  Durations are replaced by their
+    # integer rank so the strict ">" comparison stays exact.
+    _, rank = np.unique(dur, return_inverse=True)
+    width = int(rank.max()) + 2
+    key = codes * width + rank.astype(np.int64)
+    cand_pos = cand_pos[np.argsort(key[cand_pos], kind='stable')]
+    cand_key = key[cand_pos]
+
+    # For each owned bond: the candidates of the same ticker with longer duration.
+    start = np.searchsorted(cand_key, key[own_pos], side='right')
+    stop = np.searchsorted(cand_key, (codes[own_pos] + 1) * width, side='left')
+    counts = stop - start
+    left = np.repeat(own_pos, counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    right = cand_pos[np.repeat(start, counts) + offsets]
+
+    ratio = (oas[right] - oas[left]) / (dur[right] - dur[left])
+    keep = ratio > ratio_cutoff
+    left, right, ratio = left[keep], right[keep], ratio[keep]
+
+    # Restore the loop order: ticker, owned row, candidate row.
+    order = np.lexsort((right, left, codes[left]))
+    return pd.DataFrame({'owned': left[order], 'matched': right[order], 'ratio': ratio[order]})
+
+
+def top_k_mask(owned, ratio, k):
+    """Keep the ``k`` highest-ratio pairs of each owned bond (earlier pairs win ties)."""
+    owned = np.asarray(owned)
+    keep = np.ones(len(owned), dtype=bool)
+    if k is None or len(owned) == 0:
+        return keep
+    order = np.lexsort((-np.asarray(ratio), owned))
+    group_start = np.r_[True, owned[order][1:] != owned[order][:-1]]
+    starts = np.flatnonzero(group_start)
+    rank = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+    keep[order] = rank < k
+    return keep
+
+
+def top_k_pairs(pairs, k):
+    """``find_pairs`` output reduced to the top ``k`` matches per owned bond, order kept."""
+    if k is None:
+        return pairs
+    keep = top_k_mask(pairs['owned'].to_numpy(), pairs['ratio'].to_numpy(), k)
+    return pairs[keep].reset_index(drop=True)
+
+
+def _round2(values):
+    """Python's ``round(v, 2)`` per element.
+
+    ``np.round`` rounds half to even on the scaled value, which disagrees with
+    ``round`` on values such as 3.575 and would change the tables.  Away from
+    a tie the nearest integer of ``v * 100`` is unambiguous and ``k / 100`` is
+    what ``round`` returns, so only near-ties go through ``round`` itself.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    scaled = values * 100
+    out = np.round(scaled) / 100
+    with np.errstate(invalid='ignore'):
+        near_tie = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5) < 1e-6
+    out[near_tie] = [round(v, 2) for v in values[near_tie].tolist()]
+    return out
+
+
+def _diff(df, col, pairs):
+    values = df[col].to_numpy(dtype=np.float64)
+    return values[pairs['matched'].to_numpy()] - values[pairs['owned'].to_numpy()]
+
+
+def _take(df, col, pairs, side):
+    return df[col].to_numpy()[pairs[side].to_numpy()]
+
+
+def ig_trade_table(df, pairs, universe=False, sort=True):
+    """Build the IG "Potential Trade Targets" / "Entire Universe Trade" table.
+
+    ``sort=False`` skips the universe sort for pairs already in universe order.
+    """
+    sfx = '1' if universe else ''
+    out = {}
+    if universe:
+        out['CRD_STRATEGY1'] = _take(df, 'all_possible_strategies', pairs, 'owned')
+    out[f'Owned ID{sfx}'] = _take(df, 'ID', pairs, 'owned')
+    out[f'Matched ID{sfx}'] = _take(df, 'ID', pairs, 'matched')
+    out[f'Ratio OAS/Dur{sfx}'] = _round2(pairs['ratio'].to_numpy())
+    out[f'OAS Diff{sfx}'] = _round2(_diff(df, 'OAS_BP', pairs))
+    out[f'Dur Diff{sfx}'] = _round2(_diff(df, 'DURADJMOD', pairs))
+    out[f'Deviation Owned{sfx}'] = _round2(_take(df, 'Deviation', pairs, 'owned'))
+    out[f'Deviation Matched{sfx}'] = _round2(_take(df, 'Deviation', pairs, 'matched'))
+    out[f'Dev Diff{sfx}'] = _round2(_diff(df, 'Deviation', pairs))
+    table = pd.DataFrame(out)
+    if universe and sort:
+        table = sort_universe(table, 'Owned ID1', 'Ratio OAS/Dur1')
+    return table
+
+
+def hy_trade_table(df, pairs, universe=False, sort=True):
+    """Build the HY "Potential Trade Targets" / "Overall HY Trade Universe" table.
+
+    ``sort=False`` skips the universe sort for pairs already in universe order.
+    """
+    if universe:
+        table = pd.DataFrame({
+            'Cusip': _take(df, 'CUSIP', pairs, 'owned'),
+            'Owned': _take(df, 'ID', pairs, 'owned'),
+            'Matched': _take(df, 'ID', pairs, 'matched'),
+            'Cusip Matched': _take(df, 'CUSIP', pairs, 'matched'),
+            'Ratio OAS/Dur1': _round2(pairs['ratio'].to_numpy()),
+            'OAS': _round2(_diff(df, 'OAS_BP', pairs)),
+            'Dur': _round2(_diff(df, 'DURADJMOD', pairs)),
+        })
+        return sort_universe(table, 'Owned', 'Ratio OAS/Dur1') if sort else table
+    return pd.DataFrame({
+        'Owned ID': _take(df, 'ID', pairs, 'owned'),
+        'Matched ID': _take(df, 'ID', pairs, 'matched'),
+        'Ratio OAS/Dur': _round2(pairs['ratio'].to_numpy()),
+        'OAS Diff': _round2(_diff(df, 'OAS_BP', pairs)),
+        'Dur Diff': _round2(_diff(df, 'DURADJMOD', pairs)),
+    })
+
+
+def sort_universe(table, owned_col, ratio_col):
+    """Stable sort by owned bond then rounded ratio, as the old ``sorted`` call did."""
+    return table.sort_values([owned_col, ratio_col], kind='stable', ignore_index=True)
+
+
+def _splice_order(keys, lo, hi, update_keys):
+    """Rows to keep, and the order of ``kept + update`` rows, for a block splice.
+
+    ``keys`` sort the table (ticker ranks); rows ``lo[i]:hi[i]``
+    are dropped and the rows with (sorted) ``update_keys`` merged in.
+    """
+    drop = np.zeros(len(keys), dtype=bool)
+    for start, stop in zip(lo, hi):
+        drop[start:stop] = True
+    keep = np.flatnonzero(~drop)
+    # Insertion points in the full table, shifted left by the dropped rows before them.
+    at = np.searchsorted(keys, update_keys, side='left')
+    at = at - np.r_[0, np.cumsum(drop)][at]
+    return keep, _interleave(len(keep), at)
+
+
+def _interleave(n_kept, at):
+    """Order of ``kept + new`` rows that puts new row ``j`` before kept row ``at[j]`` (``at`` sorted)."""
+    is_new = np.zeros(n_kept + len(at), dtype=bool)
+    is_new[np.asarray(at, dtype=np.int64) + np.arange(len(at))] = True
+    order = np.empty(len(is_new), dtype=np.int64)
+    order[~is_new] = np.arange(n_kept)
+    order[is_new] = n_kept + np.arange(len(at))
+    return order
+
+
+def _pair_finder(executor):
+    return find_pairs if executor is None else executor.find_pairs
+
+
+def ig_masks(df, deviation_threshold):
+    """Owned bonds below the band and unowned bonds above it."""
+    band = deviation_threshold / 100 * df['NS_FIT']
+    owned = (df['Own?'] == 'Y') & (df['Deviation'] < -band)
+    candidates = (df['Own?'] == 'N') & (df['Deviation'] > band)
+    return owned.to_numpy(), candidates.to_numpy()
+
+
+def ig_pairs(df, deviation_threshold, ratio_cutoff=IG_RATIO_CUTOFF, executor=None):
+    owned, candidates = ig_masks(df, deviation_threshold)
+    return _pair_finder(executor)(df['TICKER'], df['DURADJMOD'], df['OAS_BP'], owned, candidates, ratio_cutoff)
+
+
+def hy_pairs(df, ratio_cutoff=HY_RATIO_CUTOFF, universe=False, executor=None):
+    """HY compares owned bonds with every bond (universe) or only unowned ones."""
+    owned = (df['Own?'] == 'Y').to_numpy()
+    candidates = np.ones(len(df), dtype=bool) if universe else (df['Own?'] == 'N').to_numpy()
+    return _pair_finder(executor)(df['TICKER'], df['DURADJMOD'], df['OAS_BP'], owned, candidates, ratio_cutoff)
+
+
+def iter_universe_tables(df, owned, candidates, ratio_cutoff, table_fn, top_k=None,
+                         chunk_bonds=DEFAULT_CHUNK_BONDS, executor=None):
+    """Yield the universe trade table in chunks of whole tickers.
+
+    Tickers are taken in sorted order and each chunk is sorted on its own.
+    Because every ID starts with its ticker and a space, the chunks
+    concatenate to exactly the ``table_fn(..., universe=True)`` ordering.
+    A single ticker larger than ``chunk_bonds`` forms its own chunk, and an
+    empty table is yielded when nothing qualifies so exports keep a header.
+    With an ``executor`` each chunk is ``chunk_bonds`` per worker, scanned in parallel.
+    """
+    find = _pair_finder(executor)
+    emitted = False
+    for rows in _ticker_chunks(df, chunk_bonds, executor):
+        sub = df.iloc[rows]
+        pairs = find(sub['TICKER'], sub['DURADJMOD'], sub['OAS_BP'], owned[rows], candidates[rows], ratio_cutoff)
+        pairs = top_k_pairs(pairs, top_k)
+        if len(pairs):
+            emitted = True
+            yield table_fn(sub, pairs, universe=True)
+    if not emitted:
+        yield table_fn(df, find_pairs([], [], [], [], [], ratio_cutoff), universe=True)
+
+
+def iter_pair_index_frames(df, index_fn, chunk_bonds=DEFAULT_CHUNK_BONDS, executor=None):
+    """Yield ``index_fn(df)`` as ``PairIndex.to_frame`` chunks of whole tickers.
+
+    ``PairIndex.from_frame`` of the concatenated chunks equals ``index_fn(df)``;
+    an empty chunk is yielded when there are no pairs so the schema is kept.
+    """
+    emitted = False
+    for rows in _ticker_chunks(df, chunk_bonds, executor):
+        index = index_fn(df.iloc[rows], executor=executor)
+        if len(index):
+            emitted = True
+            yield index.to_frame(rows)
+    if not emitted:
+        yield index_fn(df.iloc[:0], executor=executor).to_frame()
+
+
+def _ticker_chunks(df, chunk_bonds, executor=None):
+    """Ascending row positions of ``df`` for chunks of whole tickers, in sorted ticker order."""
+    if executor is not None:
+        chunk_bonds *= executor.workers
+    codes, uniques = pd.factorize(df['TICKER'].to_numpy(), sort=True)
+    rows_by_ticker = np.argsort(codes, kind='stable')
+    ends = np.cumsum(np.bincount(codes, minlength=len(uniques)))
+    start = 0
+    while start < len(rows_by_ticker):
+        # Extend the chunk to the end of the ticker that crosses chunk_bonds.
+        stop = ends[min(np.searchsorted(ends, start + chunk_bonds, side='left'), len(ends) - 1)]
+        yield np.sort(rows_by_ticker[start:stop])
+        start = stop
+
+
+def ig_universe_tables(df, deviation_threshold, ratio_cutoff=IG_RATIO_CUTOFF, top_k=None,
+                       chunk_bonds=DEFAULT_CHUNK_BONDS, executor=None):
+    owned, candidates = ig_masks(df, deviation_threshold)
+    return iter_universe_tables(df, owned, candidates, ratio_cutoff, ig_trade_table, top_k, chunk_bonds, executor)
+
+
+def hy_universe_tables(df, ratio_cutoff=HY_RATIO_CUTOFF, top_k=None, chunk_bonds=DEFAULT_CHUNK_BONDS,
+                       executor=None):
+    owned = (df['Own?'] == 'Y').to_numpy()
+    candidates = np.ones(len(df), dtype=bool)
+    return iter_universe_tables(df, owned, candidates, ratio_cutoff, hy_trade_table, top_k, chunk_bonds, executor)
+
+
+@dataclass(frozen=True)
+class PairIndex:
+    """A superset of universe pairs, answerable for any setting.
+
+    ``owned``/``matched`` are bond positions in the frame the index was built
+    on, in universe order; ``by_ratio`` lists the pairs by descending
+    unrounded ratio.  The deviation arrays are ``None`` for HY, whose universe
+    table does not depend on a deviation threshold.
+    """
+    owned: np.ndarray
+    matched: np.ndarray
+    ratio: np.ndarray
+    by_ratio: np.ndarray
+    owned_dev: np.ndarray = None
+    owned_fit: np.ndarray = None
+    matched_dev: np.ndarray = None
+    matched_fit: np.ndarray = None
+
+    def __len__(self):
+        return len(self.owned)
+
+    def memory_usage(self):
+        return sum(getattr(self, name).nbytes for name in INDEX_ARRAYS + ('by_ratio',)
+                   if getattr(self, name) is not None)
+
+    def to_frame(self, bond_rows=None):
+        """The index arrays as columns, for storage.
+
+        ``bond_rows`` maps ``owned``/``matched`` positions to rows of a larger bond frame.
+        """
+        out = {}
+        for name in INDEX_ARRAYS:
+            values = getattr(self, name)
+            if name in ('owned', 'matched') and bond_rows is not None:
+                values = np.asarray(bond_rows)[values]
+            if values is not None:
+                out[name] = values
+        return pd.DataFrame(out)
+
+    @classmethod
+    def from_frame(cls, frame):
+        """The ``PairIndex`` stored by ``to_frame`` (or concatenated ``iter_pair_index_frames`` chunks)."""
+        arrays = {name: frame[name].to_numpy() for name in INDEX_ARRAYS if name in frame}
+        for name in ('owned', 'matched'):
+            arrays[name] = arrays[name].astype(np.int64)
+        return cls(by_ratio=np.argsort(-arrays['ratio'], kind='stable'), **arrays)
+
+    def select(self, universe, ratio_cutoff, deviation_threshold=None, top_k=None):
+        """The universe table for ``ratio_cutoff`` (and the IG ``deviation_threshold``).
+
+        ``universe`` is the ``BondUniverse`` of the bonds the index was built
+        on; IDs and the other display columns are built for the selected pairs
+        only.  ``top_k`` keeps only the best matches per owned bond.
+        """
+        # by_ratio is descending, so "ratio > cutoff" is a prefix.
+        n = np.searchsorted(-self.ratio[self.by_ratio], -ratio_cutoff, side='left')
+        rows = self.by_ratio[:n]
+        if self.owned_dev is not None:
+            # Same expressions as ig_masks, so the comparisons are bit-for-bit identical.
+            band_owned = deviation_threshold / 100 * self.owned_fit[rows]
+            band_matched = deviation_threshold / 100 * self.matched_fit[rows]
+            rows = rows[(self.owned_dev[rows] < -band_owned) & (self.matched_dev[rows] > band_matched)]
+        rows = np.sort(rows)
+        rows = rows[top_k_mask(self.owned[rows], self.ratio[rows], top_k)]
+        bonds, at = np.unique(np.concatenate([self.owned[rows], self.matched[rows]]), return_inverse=True)
+        pairs = pd.DataFrame({'owned': at[:len(rows)], 'matched': at[len(rows):], 'ratio': self.ratio[rows]})
+        table_fn = hy_trade_table if self.owned_dev is None else ig_trade_table
+        return table_fn(universe.with_ids(universe.take(bonds)), pairs, universe=True, sort=False)
+
+    def replace_tickers(self, update, bond_rows, ticker_codes):
+        """A copy with the pairs of the tickers at ``bond_rows`` replaced by ``update``.
+
+        ``update`` is a ``PairIndex`` built on the bonds at ``bond_rows``, which
+        must cover every bond of their tickers.  ``ticker_codes`` is each bond's
+        ticker rank in sorted order, the order of the index's ticker blocks.
+        Costs a copy of the arrays plus work proportional to the replaced
+        pairs, rather than a rescan.
+        """
+        bond_rows = np.asarray(bond_rows)
+        keys = ticker_codes[self.owned]
+        replaced = np.unique(ticker_codes[bond_rows])
+        keep, order = _splice_order(keys, np.searchsorted(keys, replaced, side='left'),
+                                    np.searchsorted(keys, replaced, side='right'),
+                                    ticker_codes[bond_rows[update.owned]])
+        position = np.empty(len(order), dtype=np.int64)
+        position[order] = np.arange(len(order))
+
+        def merged(old, new):
+            return None if old is None else np.concatenate([old[keep], new])[order]
+
+        ratio = merged(self.ratio, update.ratio)
+        # Merge the kept pairs' descending-ratio order with the update's.
+        moved = np.full(len(self), -1, dtype=np.int64)
+        moved[keep] = position[:len(keep)]
+        kept_rows = moved[self.by_ratio]
+        kept_rows = kept_rows[kept_rows >= 0]
+        new_rows = position[len(keep):][update.by_ratio]
+        at = np.searchsorted(-ratio[kept_rows], -ratio[new_rows], side='right')
+        return PairIndex(
+            owned=merged(self.owned, bond_rows[update.owned]),
+            matched=merged(self.matched, bond_rows[update.matched]),
+            ratio=ratio,
+            by_ratio=np.concatenate([kept_rows, new_rows])[_interleave(len(kept_rows), at)],
+            owned_dev=merged(self.owned_dev, update.owned_dev),
+            owned_fit=merged(self.owned_fit, update.owned_fit),
+            matched_dev=merged(self.matched_dev, update.matched_dev),
+            matched_fit=merged(self.matched_fit, update.matched_fit),
+        )
+
+
+def _pair_index(df, pairs, deviations):
+    # Put the pairs in universe order, the order select returns them in.
+    order = pd.DataFrame({
+        'owned': _take(df, 'ID', pairs, 'owned'),
+        'ratio': _round2(pairs['ratio'].to_numpy()),
+    }).sort_values(['owned', 'ratio'], kind='stable').index.to_numpy()
+    pairs = pairs.take(order).reset_index(drop=True)
+    own, match = pairs['owned'].to_numpy(), pairs['matched'].to_numpy()
+    ratio = pairs['ratio'].to_numpy()
+    extra = {}
+    if deviations:
+        dev = df['Deviation'].to_numpy(dtype=np.float64)
+        fit = df['NS_FIT'].to_numpy(dtype=np.float64)
+        extra = {'owned_dev': dev[own], 'owned_fit': fit[own], 'matched_dev': dev[match], 'matched_fit': fit[match]}
+    return PairIndex(owned=own, matched=match, ratio=ratio, by_ratio=np.argsort(-ratio, kind='stable'), **extra)
+
+
+def ig_pair_index(df, threshold_range=IG_THRESHOLD_RANGE, ratio_floor=RATIO_CUTOFF_FLOOR, executor=None):
+    """IG ``PairIndex`` covering thresholds in ``threshold_range`` and cutoffs >= ``ratio_floor``."""
+    # The band conditions are linear in the threshold, so a bond qualifies somewhere
+    # in the range exactly when it qualifies at one of its ends.
+    lo_owned, lo_cand = ig_masks(df, threshold_range[0])
+    hi_owned, hi_cand = ig_masks(df, threshold_range[1])
+    pairs = _pair_finder(executor)(df['TICKER'], df['DURADJMOD'], df['OAS_BP'],
+                                   lo_owned | hi_owned, lo_cand | hi_cand, ratio_floor)
+    return _pair_index(df, pairs, deviations=True)
+
+
+def hy_pair_index(df, ratio_floor=RATIO_CUTOFF_FLOOR, executor=None):
+    """HY universe ``PairIndex`` covering cutoffs >= ``ratio_floor``."""
+    return _pair_index(df, hy_pairs(df, ratio_floor, universe=True, executor=executor), deviations=False)
@@ -0,0 +1,197 @@
+"""Process-wide analytics snapshot shared by every Streamlit session.
+
+The snapshot holds the IG NS fits, the what-if pair indexes the universe
+tables are selected from and the processed IG/HY bonds as compact
+ticker-sorted ``BondUniverse`` views; the ownership index and the full bond
+frames are dropped once those are built.  A ``SnapshotStore`` builds the first snapshot
+on demand and then refreshes it on a daemon thread; a new snapshot is only
+built when the source data version changes and is swapped in atomically, so
+reruns never see a half-built state.  A snapshot can cover a subset of
+``SEGMENTS``; the app keeps one store per segment so viewing IG never builds HY,
+and an ``OwnershipCache`` lets those stores share one ownership index per
+version of the positions.
+``SnapshotStore.patch`` installs an edited copy of the current snapshot (an
+intraday update, see ``analytics.intraday``) without refetching the sources.
+An ``executor`` (``analytics.parallel``) spreads the fits and pair scans of a
+build over a process pool.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass, replace
+
+import pandas as pd
+
+from analytics.instrumentation import StageTimer, count
+from analytics.ownership import build_ownership_index
+from analytics.processing import build_hy, build_ig
+from analytics.signals import PairIndex, hy_pair_index, ig_pair_index
+from analytics.universe import BondUniverse
+
+logger = logging.getLogger(__name__)
+
+REFRESH_INTERVAL_SECONDS = 900
+SEGMENTS = ('ig', 'hy')
+
+
+@dataclass(frozen=True)
+class AnalyticsSnapshot:
+    version: str
+    built_at: float
+    ig_fits: pd.DataFrame = None
+    ig_pair_index: PairIndex = None
+    hy_pair_index: PairIndex = None
+    ig_universe: BondUniverse = None
+    hy_universe: BondUniverse = None
+    timings: tuple = ()
+    updated_at: float = None
+
+
+def data_version(raw):
+    """Content hash of the raw source frames."""
+    parts = [f"{name}:{pd.util.hash_pandas_object(df, index=False).sum()}:{len(df)}"
+             for name, df in sorted(raw.items())]
+    return '|'.join(parts)
+
+
+class OwnershipCache:
+    """The ownership index of the latest positions, built once for every snapshot that uses them."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._index = None
+
+    def get(self, positions):
+        version = data_version({'positions': positions})
+        with self._lock:
+            if version != self._version:
+                self._index = build_ownership_index(positions)
+                self._version = version
+                count('ownership.builds')
+            else:
+                count('ownership.shared')
+            return self._index
+
+
+def build_snapshot(raw, version=None, timer=None, param_store=None, segments=SEGMENTS, executor=None,
+                   ownership_cache=None):
+    """Snapshot of ``segments``; ``raw`` needs their sources plus ``positions``."""
+    timer = timer or StageTimer()
+    with timer.stage('ownership') as s:
+        ownership = (build_ownership_index(raw['positions']) if ownership_cache is None
+                     else ownership_cache.get(raw['positions']))
+        s['rows'] = len(ownership.cusips)
+    fields, ig_bonds, hy_bonds = {}, None, None
+    # Universe tables are selected from the pair indexes, so none is built here.
+    if 'ig' in segments:
+        ig_bonds, fields['ig_fits'], _ = build_ig(
+            raw['ig'], ownership, timer=timer, param_store=param_store, universe_signals=False, executor=executor)
+    if 'hy' in segments:
+        hy_bonds, _ = build_hy(raw['hy'], ownership, timer=timer, universe_signals=False, executor=executor)
+    fields.update(build_derived(ig_bonds, hy_bonds, timer, executor))
+    return AnalyticsSnapshot(
+        version=version or data_version(raw),
+        built_at=time.time(),
+        timings=tuple(timer.records),
+        **fields,
+    )
+
+
+def build_derived(ig_bonds, hy_bonds, timer, executor=None, pair_indexes=None):
+    """Pair indexes and compact universes, as ``AnalyticsSnapshot`` keyword arguments.
+
+    A segment whose bonds are ``None`` is skipped; one in ``pair_indexes``
+    (segment -> ``PairIndex``) keeps that index instead of being rescanned.
+    """
+    derived = {}
+    pair_indexes = pair_indexes or {}
+    for segment, bonds, index_fn in (('ig', ig_bonds, ig_pair_index), ('hy', hy_bonds, hy_pair_index)):
+        if bonds is None:
+            continue
+        if segment in pair_indexes:
+            derived[f'{segment}_pair_index'] = pair_indexes[segment]
+        else:
+            with timer.stage(f'{segment}.pair_index') as s:
+                derived[f'{segment}_pair_index'] = index_fn(bonds, executor=executor)
+                s['rows'] = len(derived[f'{segment}_pair_index'])
+        with timer.stage(f'{segment}.universe', rows=len(bonds)):
+            derived[f'{segment}_universe'] = BondUniverse(bonds)
+    return derived
+
+
+class SnapshotStore:
+    """Holds the current snapshot and rebuilds it off the request path.
+
+    ``fetch`` returns the raw source frames as ``{'ig', 'hy', 'positions'}``;
+    ``version(raw)`` and ``build(raw, version, timer)`` turn that into a data
+    version and a snapshot.
+    """
+
+    def __init__(self, fetch, interval=REFRESH_INTERVAL_SECONDS, version=data_version, build=build_snapshot):
+        self._fetch = fetch
+        self._version = version
+        self._build = build
+        self._interval = interval
+        self._snapshot = None
+        self._build_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def current(self):
+        """The latest snapshot; builds it in the caller's thread the first time."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            self.refresh()
+            snapshot = self._snapshot
+        return snapshot
+
+    def refresh(self, force=False):
+        """Fetch sources and swap in a new snapshot if the data version changed.
+
+        Returns ``True`` when a new snapshot was installed.
+        """
+        with self._build_lock:
+            timer = StageTimer('snapshot.')
+            with timer.stage('fetch'):
+                raw = self._fetch()
+            with timer.stage('version'):
+                version = self._version(raw)
+            if not force and self._snapshot is not None and self._snapshot.version == version:
+                count('snapshot.unchanged')
+                return False
+            snapshot = self._build(raw, version, timer)
+            self._snapshot = replace(snapshot, timings=tuple(timer.records))
+            count('snapshot.rebuilds')
+            logger.info("Installed analytics snapshot %s in %.2fs", version, timer.total())
+            return True
+
+    def patch(self, update):
+        """Install ``update(snapshot)``'s new snapshot in place of the current one.
+
+        ``update`` returns ``(snapshot, result)``; ``result`` is passed back.  The
+        patch holds until a refresh finds a new source data version.
+        """
+        self.current  # build the first snapshot outside the lock
+        with self._build_lock:
+            snapshot, result = update(self._snapshot)
+            self._snapshot = snapshot
+        count('snapshot.patches')
+        return result
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='snapshot-refresher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Analytics snapshot refresh failed; keeping the previous snapshot")
@@ -0,0 +1,38 @@
+"""Source tables for the Curve page and the columns the app actually uses."""
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class TableSpec:
+    """A source table projected to ``columns``.
+
+    ``as_of`` names a date/timestamp column that enables incremental refresh:
+    only rows newer than the last watermark are fetched and upserted on ``key``,
+    which it therefore requires.
+    """
+    name: str
+    columns: tuple
+    key: tuple = ()
+    as_of: str = None
+
+    def __post_init__(self):
+        if self.as_of and not self.key:
+            raise ValueError(f"{self.name}: incremental refresh on {self.as_of!r} needs a key to upsert on")
+
+    @property
+    def projection(self):
+        """Columns to fetch: ``columns`` plus the ``as_of`` watermark column."""
+        if self.as_of and self.as_of not in self.columns:
+            return self.columns + (self.as_of,)
+        return self.columns
+
+
+BOND_COLUMNS = ('TICKER', 'CUSIP', 'COUPON', 'MATURDATE', 'DURADJMOD', 'OAS_BP')
+POSITION_COLUMNS = ('CUSIP', 'TICK', 'CRD_STRATEGY', 'SHARE_PAR_VALUE')
+
+IG_BONDS = TableSpec('CORPORATE.INVESTMENT_GRADE.DAILY_CURVE_IG_DATA', BOND_COLUMNS, key=('CUSIP',))
+HY_BONDS = TableSpec('CORPORATE.HIGH_YIELD.DAILY_CURVE_HY_DATA', BOND_COLUMNS, key=('CUSIP',))
+#POSITIONS = TableSpec('TRADERS.EAGLE.SELCTION_POSITIONS', POSITION_COLUMNS)
+POSITIONS = TableSpec('CORPORATE.GENERAL.CORP_CURRENT_POSITIONS', POSITION_COLUMNS)
+
+SOURCES = {'ig': IG_BONDS, 'hy': HY_BONDS, 'positions': POSITIONS}
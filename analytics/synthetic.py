@@ -0,0 +1,94 @@
+"""Synthetic IG/HY bond universes for benchmarking and local development.
+
+Each ticker gets its own Nelson-Siegel curve; bond OAS is that curve at the
+bond's duration plus noise.  Issuer sizes are skewed (a few large issuers,
+many small ones) and a fraction of bonds is held across one or more
+strategies, so the frames look like the Snowflake source tables.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from analytics.nelson_siegel import ns_func
+from analytics.sources import SOURCES
+
+STRATEGIES = ['CORE', 'CREDIT', 'LD', 'MULTI', 'TOTRET', 'INS', 'MODEL', 'PLEDGE', 'UNSUP']
+SEGMENT_SHAPES = {
+    # (base OAS range, slope range, noise bp)
+    'ig': ((60, 180), (40, 120), 6),
+    'hy': ((250, 600), (80, 300), 25),
+}
+
+
+def bond_universe(n_bonds, segment='ig', seed=0, mean_bonds_per_ticker=12, first_cusip=0):
+    rng = np.random.default_rng(seed)
+    n_tickers = max(1, n_bonds // mean_bonds_per_ticker)
+    weights = 1.0 / np.arange(1, n_tickers + 1) ** 0.8
+    tickers = rng.choice(n_tickers, size=n_bonds, p=weights / weights.sum())
+
+    (base_lo, base_hi), (slope_lo, slope_hi), noise = SEGMENT_SHAPES[segment]
+    beta0 = rng.uniform(base_lo, base_hi, n_tickers) + rng.uniform(slope_lo, slope_hi, n_tickers)
+    beta1 = -rng.uniform(slope_lo, slope_hi, n_tickers)
+    beta2 = rng.normal(0, slope_lo, n_tickers)
+    lambda1 = rng.uniform(1.0, 6.0, n_tickers)
+
+    dur = np.round(rng.gamma(2.0, 3.0, n_bonds).clip(0.1, 25.0), 3)
+    oas = ns_func(dur, beta0[tickers], beta1[tickers], beta2[tickers], lambda1[tickers])
+    oas = np.round(oas + rng.normal(0, noise, n_bonds), 1)
+
+    years = 2026 + np.ceil(dur * 1.25).astype(int)
+    maturdate = years * 10000 + rng.integers(1, 13, n_bonds) * 100 + rng.integers(1, 29, n_bonds)
+    coupon = rng.choice(np.arange(1.0, 9.0, 0.125), n_bonds)
+    return pd.DataFrame({
+        'TICKER': np.array([f"{segment.upper()}{t:05d}" for t in range(n_tickers)])[tickers],
+        'CUSIP': [f"{segment[0].upper()}{i:08d}" for i in range(first_cusip, first_cusip + n_bonds)],
+        'COUPON': coupon,
+        'MATURDATE': maturdate,
+        'DURADJMOD': dur,
+        'OAS_BP': oas,
+    })
+
+
+def positions(bonds, owned_fraction=0.25, seed=0):
+    """Position rows (one per CUSIP and strategy) for a random share of ``bonds``."""
+    rng = np.random.default_rng(seed)
+    owned = bonds.sample(frac=owned_fraction, random_state=seed)
+    n_strategies = rng.integers(1, 4, len(owned))
+    rows = np.repeat(np.arange(len(owned)), n_strategies)
+    # Distinct strategies per CUSIP: the first k entries of a random permutation.
+    perm = np.argsort(rng.random((len(owned), len(STRATEGIES))), axis=1)
+    slot = np.arange(len(rows)) - np.repeat(np.cumsum(n_strategies) - n_strategies, n_strategies)
+    return pd.DataFrame({
+        'CUSIP': owned['CUSIP'].to_numpy()[rows],
+        'TICK': owned['TICKER'].to_numpy()[rows],
+        'CRD_STRATEGY': np.array(STRATEGIES)[perm[rows, slot]],
+        'SHARE_PAR_VALUE': np.round(rng.lognormal(14.5, 1.0, len(rows)), 2),
+    })
+
+
+def universe(n_bonds, seed=0, hy_fraction=0.5, owned_fraction=0.25):
+    """Raw source frames ``{'ig', 'hy', 'positions'}``: ``n_bonds`` IG bonds, ``hy_fraction`` as many HY."""
+    ig = bond_universe(n_bonds, 'ig', seed)
+    hy = bond_universe(max(1, int(n_bonds * hy_fraction)), 'hy', seed + 1)
+    held = pd.concat([positions(ig, owned_fraction, seed), positions(hy, owned_fraction, seed + 1)],
+                     ignore_index=True)
+    return {'ig': ig, 'hy': hy, 'positions': held}
+
+
+def oas_moves(bonds, n_bonds, seed=0, scale_bp=5.0):
+    """An intraday update batch: new OAS_BP (and unchanged DURADJMOD) for ``n_bonds`` random bonds."""
+    rng = np.random.default_rng(seed)
+    moved = bonds.sample(n=min(n_bonds, len(bonds)), random_state=seed)
+    return pd.DataFrame({
+        'CUSIP': moved['CUSIP'].to_numpy(),
+        'OAS_BP': np.round(moved['OAS_BP'].to_numpy() + rng.normal(0, scale_bp, len(moved)), 1),
+        'DURADJMOD': moved['DURADJMOD'].to_numpy(),
+    })
+
+
+def write_sources(raw, root):
+    """Write ``raw`` as ``<table>.parquet`` files readable by ``ParquetBackend``."""
+    os.makedirs(root, exist_ok=True)
+    for name, df in raw.items():
+        df.to_parquet(os.path.join(root, f"{SOURCES[name].name}.parquet"), index=False)
@@ -0,0 +1,130 @@
+"""Compact, ticker-sorted bond universe for per-ticker views.
+
+``BondUniverse`` keeps the processed bonds sorted by ticker with categorical
+string columns and integer (YYYYMMDD) maturity dates, and drops the
+per-row ``ID`` string; IDs are rebuilt only for the rows being displayed.
+A per-ticker offset index turns each ticker view into a contiguous row
+slice instead of a boolean-mask copy of the whole frame.  ``replace_values``
+patches rows of an intraday update into a copy without re-sorting, and
+``take`` and ``bonds`` look rows up by their position in the processed
+frame, which is how pair indexes refer to bonds.
+"""
+import copy
+
+import numpy as np
+import pandas as pd
+
+CATEGORICAL_COLUMNS = ('TICKER', 'CUSIP', 'COUPON', 'Own?', 'Above/Below', 'all_possible_strategies')
+
+
+def _maturity_strings(ints):
+    return [f"{d // 100 % 100:02d}/{d % 100:02d}/{d // 10000}" for d in ints.tolist()]
+
+
+def _maturity_ints(maturdate):
+    """``mm/dd/YYYY`` strings as YYYYMMDD integers, parsing each distinct date once."""
+    codes, uniques = pd.factorize(maturdate)
+    parsed = pd.to_datetime(pd.Series(uniques), format='%m/%d/%Y')
+    ints = (parsed.dt.year * 10000 + parsed.dt.month * 100 + parsed.dt.day).to_numpy(dtype=np.int32)
+    return ints[codes]
+
+
+class BondUniverse:
+    def __init__(self, bonds):
+        """Build from ``prepare_bonds`` output (plus any ownership/deviation columns)."""
+        order = np.argsort(bonds['TICKER'].to_numpy(dtype=object), kind='stable')
+        df = bonds.drop(columns=['ID']).iloc[order].reset_index(drop=True)
+        for col in CATEGORICAL_COLUMNS:
+            if col in df:
+                df[col] = df[col].astype('category')
+        df['MATURDATE'] = _maturity_ints(df['MATURDATE'].to_numpy())
+        self.frame = df
+        self._columns = list(bonds.columns)
+        self._dtypes = bonds.dtypes
+        # Build-frame row of each sorted row, and the inverse.
+        self._order = order
+        self._slot = np.empty(len(order), dtype=np.int64)
+        self._slot[order] = np.arange(len(order))
+        self._cusip_index = None
+        self._ticker_codes = None
+
+        codes = df['TICKER'].cat.codes.to_numpy()
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else np.empty(0, int)
+        stops = np.r_[starts[1:], len(codes)]
+        names = df['TICKER'].cat.categories[codes[starts]]
+        self.tickers = list(names)
+        self._offsets = dict(zip(names, zip(starts.tolist(), stops.tolist())))
+
+    def __len__(self):
+        return len(self.frame)
+
+    def ticker(self, ticker):
+        """The ticker's rows (in original order) as a slice of the sorted frame."""
+        start, stop = self._offsets.get(ticker, (0, 0))
+        return self.frame.iloc[start:stop]
+
+    def rows(self, tickers):
+        """Positions of ``tickers``' bonds in the frame the universe was built from, ascending."""
+        spans = [self._offsets[t] for t in tickers if t in self._offsets]
+        if not spans:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate([self._order[start:stop] for start, stop in spans]))
+
+    def cusip_rows(self, cusips):
+        """Build-frame positions of ``cusips`` (-1 where unknown)."""
+        if self._cusip_index is None:
+            self._cusip_index = pd.Index(self.frame['CUSIP'].astype(str).to_numpy())
+        found = self._cusip_index.get_indexer(np.asarray(cusips, dtype=str))
+        return np.where(found >= 0, self._order[found], -1)
+
+    def ticker_codes(self):
+        """Each build-frame row's ticker rank in sorted ticker order."""
+        if self._ticker_codes is None:
+            self._ticker_codes = self.frame['TICKER'].cat.codes.to_numpy()[self._slot]
+        return self._ticker_codes
+
+    def replace_values(self, rows, values):
+        """A copy with ``values`` (column -> array) written at build-frame ``rows``.
+
+        Tickers, row order and the offset index are shared with this universe.
+        """
+        out = copy.copy(self)
+        out.frame = self.frame.copy(deep=False)
+        at = self._slot[rows]
+        for col, new in values.items():
+            column = out.frame[col].copy()
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                missing = pd.Index(pd.unique(np.asarray(new))).difference(column.cat.categories)
+                column = column.cat.add_categories(missing)
+            column.iloc[at] = new
+            out.frame[col] = column
+        return out
+
+    def take(self, rows):
+        """Build-frame ``rows`` as rows of ``frame``."""
+        return self.frame.iloc[self._slot[rows]]
+
+    def bonds(self, rows):
+        """Build-frame ``rows`` as the frame the universe was built from, indexed by those positions."""
+        out = self.with_ids(self.take(rows))
+        out['MATURDATE'] = pd.Series(_maturity_strings(out['MATURDATE'].to_numpy()), index=out.index,
+                                     dtype=self._dtypes['MATURDATE'])
+        for col in CATEGORICAL_COLUMNS:
+            if col in out:
+                values = out[col].to_numpy(dtype=object)
+                values[out[col].isna().to_numpy()] = None
+                out[col] = pd.Series(values, index=out.index, dtype=self._dtypes[col])
+        out.index = pd.Index(rows)
+        return out[self._columns]
+
+    def with_ids(self, rows):
+        """``rows`` (a slice of ``frame``) with the display ``ID`` column inserted as in ``prepare_bonds``."""
+        # Plain Python formatting: the rows are one ticker or a table page, so this beats Series ops.
+        ids = [f"{t} {c} {d // 100 % 100:02d}/{d % 100:02d}/{d // 10000}"
+               for t, c, d in zip(rows['TICKER'].tolist(), rows['COUPON'].tolist(), rows['MATURDATE'].tolist())]
+        out = rows.copy()
+        out.insert(min(3, len(out.columns)), 'ID', pd.Series(ids, index=out.index, dtype=str))
+        return out
+
+    def memory_usage(self):
+        return int(self.frame.memory_usage(deep=True).sum())
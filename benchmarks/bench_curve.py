@@ -0,0 +1,210 @@
+"""Benchmark the Curve page hot paths on synthetic bond universes.
+
+Times each stage of the IG/HY pipeline, records its peak traced memory and,
+for sizes up to ``--check-max``, runs the original implementation from
+``benchmarks.legacy`` to time it and check the outputs agree.
+
+    python -m benchmarks.bench_curve --sizes 1000 10000 100000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from analytics.intraday import apply_updates
+from analytics.nelson_siegel import fit_ns_batch, fitted_values
+from analytics.ownership import apply_ownership, build_ownership_index
+from analytics.parallel import TickerExecutor
+from analytics.peers import PeerHistory, duration_buckets, peer_zscores
+from analytics.processing import IG_MIN_BONDS_PER_TICKER, add_ns_deviation, prepare_bonds
+from analytics.signals import IG_RATIO_CUTOFF, hy_pairs, hy_trade_table, ig_pair_index, ig_pairs, ig_trade_table
+from analytics.snapshot import build_snapshot
+from analytics.synthetic import oas_moves, universe
+from analytics.universe import BondUniverse
+from benchmarks import legacy
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+
+def measure(fn, *args, memory=True):
+    """``(result, seconds, peak_bytes)``; memory is traced in a second, untimed run."""
+    started = time.perf_counter()
+    result = fn(*args)
+    seconds = time.perf_counter() - started
+    peak = None
+    if memory:
+        tracemalloc.start()
+        fn(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, seconds, peak
+
+
+def bench_size(n_bonds, check, seed=0, workers=None):
+    raw = universe(n_bonds, seed=seed)
+    rows = []
+
+    def record(stage, seconds, peak, legacy_seconds=None, match=None, **extra):
+        rows.append({'n_bonds': n_bonds, 'stage': stage, 'seconds': round(seconds, 4),
+                     'peak_mb': None if peak is None else round(peak / 2 ** 20, 2),
+                     'legacy_seconds': None if legacy_seconds is None else round(legacy_seconds, 4),
+                     'match': match, **extra})
+
+    # --- ID / MATURDATE string building ---
+    ig, t, peak = measure(prepare_bonds, raw['ig'], IG_MIN_BONDS_PER_TICKER)
+    hy = prepare_bonds(raw['hy'])
+    record('prepare_bonds', t, peak)
+
+    # --- Positions / ownership ---
+    def ownership():
+        index = build_ownership_index(raw['positions'])
+        return apply_ownership(ig, index, 'ig'), apply_ownership(hy, index, 'hy')
+    (ig, hy), t, peak = measure(ownership)
+    legacy_t = match = None
+    if check:
+        started = time.perf_counter()
+        old_ig = legacy.ig_ownership(ig.drop(columns=['Own?', 'all_possible_strategies']), raw['positions'])
+        old_hy = legacy.hy_ownership(hy.drop(columns=['Own?']), raw['positions'])
+        legacy_t = time.perf_counter() - started
+        match = bool((old_ig['Own?'].to_numpy() == ig['Own?'].to_numpy()).all()
+                     and (old_hy['Own?'].to_numpy() == hy['Own?'].to_numpy()).all())
+    record('ownership', t, peak, legacy_t, match)
+
+    # --- NS fits ---
+    fits, t, peak = measure(fit_ns_batch, ig['TICKER'], ig['DURADJMOD'], ig['OAS_BP'])
+    legacy_t = match = None
+    extra = {}
+    if check:
+        old, legacy_t, _ = measure(legacy.fit_all, ig, memory=False)
+        common = [k for k in old if np.isfinite(fits.loc[k, 'rss'])]
+        ratio = np.array([fits.loc[k, 'rss'] / max(old[k][1], 1e-12) for k in common])
+        # Different optimizers: "match" means no worse than curve_fit by more than 5%.
+        match = bool(len(ratio) and np.median(ratio) <= 1.05)
+        extra = {'median_rss_ratio': round(float(np.median(ratio)), 4) if len(ratio) else None}
+    record('ns_fit', t, peak, legacy_t, match, **extra)
+
+    _, t, peak = measure(fitted_values, fits, ig['TICKER'], ig['DURADJMOD'])
+    record('ns_eval', t, peak)
+    ig = add_ns_deviation(ig, fits)
+
+    # --- Pair signals ---
+    def ig_signals():
+        return ig_trade_table(ig, ig_pairs(ig, 5), universe=True)
+    table, t, peak = measure(ig_signals)
+    legacy_t = match = None
+    if check:
+        old, legacy_t, _ = measure(legacy.ig_universe_signals, ig, memory=False)
+        match = bool(old.equals(table) or (old.empty and table.empty))
+    record('ig_signals', t, peak, legacy_t, match, signals=len(table))
+
+    def hy_signals():
+        return hy_trade_table(hy, hy_pairs(hy, universe=True), universe=True)
+    table, t, peak = measure(hy_signals)
+    legacy_t = match = None
+    if check:
+        old, legacy_t, _ = measure(legacy.hy_universe_signals, hy, memory=False)
+        match = bool(old.equals(table) or (old.empty and table.empty))
+    record('hy_signals', t, peak, legacy_t, match, signals=len(table))
+
+    # --- Per-ticker views: boolean mask vs compact universe slice ---
+    tickers = sorted(ig['TICKER'].unique())[:200]
+    bonds, t, peak = measure(BondUniverse, ig)
+    record('universe', t, peak, bytes_mb=round(bonds.memory_usage() / 2 ** 20, 2),
+           frame_mb=round(ig.memory_usage(deep=True).sum() / 2 ** 20, 2))
+
+    # --- What-if index: positions and ratios only; display columns built per selection ---
+    index, t, peak = measure(ig_pair_index, ig)
+    record('ig_pair_index', t, peak, bytes_mb=round(index.memory_usage() / 2 ** 20, 2), pairs=len(index))
+    selected, t, peak = measure(index.select, bonds, IG_RATIO_CUTOFF, 5)
+    match = bool(selected.equals(ig_trade_table(ig, ig_pairs(ig, 5), universe=True))) if check else None
+    record('ig_whatif', t, peak, None, match, signals=len(selected))
+
+    def slices():
+        return [bonds.ticker(x) for x in tickers]
+    views, t, peak = measure(slices)
+    legacy_t = match = None
+    if check:
+        started = time.perf_counter()
+        old = [ig[ig['TICKER'] == x] for x in tickers]
+        legacy_t = time.perf_counter() - started
+        match = all(list(a['ID']) == list(bonds.with_ids(b)['ID'])
+                    and (a['OAS_BP'].to_numpy() == b['OAS_BP'].to_numpy()).all() for a, b in zip(old, views))
+    record('ticker_slice', t, peak, legacy_t, match)
+
+    # --- Peer z-scores: segment reductions vs a loop over peer buckets ---
+    scores, t, peak = measure(peer_zscores, ig)
+    legacy_t = match = None
+    if check:
+        started = time.perf_counter()
+        buckets, _ = duration_buckets(ig['DURADJMOD'])
+        old = pd.Series(np.nan, index=ig.index)
+        for _, group in ig.groupby([ig['TICKER'], buckets])['OAS_BP']:
+            if len(group) >= 3 and group.std() > 0:
+                old[group.index] = (group - group.mean()) / group.std()
+        legacy_t = time.perf_counter() - started
+        match = bool(np.allclose(old.to_numpy(), scores['OAS_Z'].to_numpy(), equal_nan=True))
+    record('peer_z', t, peak, legacy_t, match)
+
+    # --- Peer history: one more day on a full rolling window ---
+    with tempfile.TemporaryDirectory() as tmp:
+        history = PeerHistory(os.path.join(tmp, 'peers.db'), window=5)
+        for day in range(1, 6):
+            history.add_day('ig', f'2026-01-{day:02d}', ig)
+        _, t, _ = measure(history.add_day, 'ig', '2026-01-06', ig, memory=False)
+    record('peer_history_day', t, None)
+
+    # --- End to end ---
+    snapshot, t, peak = measure(build_snapshot, raw)
+    record('snapshot', t, peak)
+
+    # --- The same build with fits and scans on a process pool ---
+    with TickerExecutor(workers) as executor:
+        executor.fit_ns_batch(ig['TICKER'], ig['DURADJMOD'], ig['OAS_BP'])  # start the workers untimed
+        parallel, t, _ = measure(partial(build_snapshot, executor=executor), raw, memory=False)
+    match = (parallel.ig_fits.equals(snapshot.ig_fits)
+             and all(getattr(parallel, f).frame.equals(getattr(snapshot, f).frame) for f in ('ig_universe', 'hy_universe'))
+             and all(getattr(parallel, f).to_frame().equals(getattr(snapshot, f).to_frame())
+                     for f in ('ig_pair_index', 'hy_pair_index')))
+    record('snapshot_parallel', t, None, None, match, workers=executor.workers)
+
+    # --- Intraday: ten bonds move; only their tickers are refit and rescanned ---
+    (_, summary), t, peak = measure(apply_updates, snapshot, oas_moves(snapshot.ig_universe.frame, 10, seed=seed))
+    record('intraday_update', t, peak, tickers=len(summary['ig']['tickers']))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Curve page pipeline stages.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help="Bonds per segment")
+    parser.add_argument('--check-max', type=int, default=10000,
+                        help="Largest size at which the legacy implementation is run and compared")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Processes for the snapshot_parallel stage (default: one per core)")
+    parser.add_argument('--json', help="Also write the results to this file")
+    args = parser.parse_args(argv)
+
+    rows = []
+    for n in args.sizes:
+        rows.extend(bench_size(n, n <= args.check_max, args.seed, args.workers))
+    header = f"{'n_bonds':>8} {'stage':<14} {'seconds':>9} {'peak_mb':>8} {'legacy_s':>9} {'match':>6}"
+    print(header)
+    for r in rows:
+        print(f"{r['n_bonds']:>8} {r['stage']:<14} {r['seconds']:>9.4f} {r['peak_mb'] if r['peak_mb'] is not None else '':>8} "
+              f"{r['legacy_seconds'] if r['legacy_seconds'] is not None else '':>9} {'' if r['match'] is None else r['match']!s:>6}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(rows, f, indent=2)
+    failed = [r for r in rows if r['match'] is False]
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
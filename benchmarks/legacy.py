@@ -0,0 +1,136 @@
+"""Reference copies of the original NS_GIT_APP Curve page code paths.
+
+Kept verbatim (modulo wrapping in functions) so benchmarks can time them and
+check the optimized implementations against their output.
+"""
+import numpy as np
+import pandas as pd
+from scipy.optimize import curve_fit
+
+from analytics.nelson_siegel import ns_func
+
+
+def prepare_bonds(df_bonds, min_count=None):
+    df_bonds = df_bonds.copy()
+    df_bonds['TICKER'] = df_bonds['TICKER'].astype(str)
+    df_bonds['COUPON'] = df_bonds['COUPON'].astype(str)
+    df_bonds['MATURDATE'] = pd.to_datetime(df_bonds['MATURDATE'], format='%Y%m%d').dt.strftime('%m/%d/%Y')
+    df_bonds.insert(3, 'ID', df_bonds['TICKER'] + ' ' + df_bonds['COUPON'] + ' ' + df_bonds['MATURDATE'])
+    df_bonds['DURADJMOD'] = pd.to_numeric(df_bonds['DURADJMOD'], errors='coerce')
+    df_bonds['OAS_BP'] = pd.to_numeric(df_bonds['OAS_BP'], errors='coerce')
+    df_bonds = df_bonds.dropna(subset=['DURADJMOD', 'OAS_BP'])
+    if min_count:
+        df_bonds = df_bonds[df_bonds['TICKER'].map(df_bonds['TICKER'].value_counts()) >= min_count]
+    return df_bonds
+
+
+def ig_ownership(df_bonds, df_positions):
+    df_positions = df_positions.copy()
+    df_positions.columns = [f"{col}_{i}" if df_positions.columns.duplicated()[i] else col for i, col in enumerate(df_positions.columns)]
+    df_positions = df_positions[~df_positions['CRD_STRATEGY'].isin(['INS', 'MODEL', 'PLEDGE', 'UNSUP'])]
+    box_map = (df_positions.groupby(['CUSIP', 'TICK'])['CRD_STRATEGY']
+       .apply(lambda x: ', '.join(sorted(set(x))))
+       .reset_index()
+       .rename(columns={'CRD_STRATEGY': 'all_possible_strategies'})
+    )
+    df_positions = df_positions.drop(columns=['CRD_STRATEGY']).drop_duplicates()
+    df_positions = df_positions.merge(box_map, on=['CUSIP', 'TICK'], how='left')
+    df_positions = df_positions.groupby(['CUSIP', 'TICK', 'all_possible_strategies'])['SHARE_PAR_VALUE'].sum().reset_index()
+    df_positions['SHARE_PAR_VALUE'] = pd.to_numeric(df_positions['SHARE_PAR_VALUE'], errors='coerce')
+    df_positions = df_positions[df_positions['SHARE_PAR_VALUE'] > 2000000]
+    df_bonds = df_bonds.merge(df_positions[['CUSIP', 'all_possible_strategies']], on='CUSIP', how='left', indicator=True)
+    df_bonds['Own?'] = df_bonds['_merge'].map({'both': 'Y', 'left_only': 'N', 'right_only': 'N'})
+    return df_bonds
+
+
+def hy_ownership(df_bonds, df_positions):
+    df_positions = df_positions.groupby(['CUSIP', 'TICK'])['SHARE_PAR_VALUE'].sum().reset_index()
+    df_bonds = df_bonds.merge(df_positions[['CUSIP']], on='CUSIP', how='left', indicator=True)
+    df_bonds['Own?'] = df_bonds['_merge'].map({'both': 'Y', 'left_only': 'N', 'right_only': 'N'})
+    return df_bonds
+
+
+def fit_ns_curve(x, y):
+    try:
+        initial_params = [0.01, -0.01, 0.01, 1.0]
+        params, _ = curve_fit(ns_func, x, y, p0=initial_params, maxfev=10000)
+        y_fit = ns_func(x, *params)
+        return params, y_fit
+    except Exception:
+        return None, None
+
+
+def fit_all(df_bonds):
+    """Per-ticker cold-start fits as ``{ticker: (params, rss)}``."""
+    out = {}
+    for ticker in df_bonds['TICKER'].unique():
+        df_filtered1 = df_bonds[df_bonds['TICKER'] == ticker]
+        if len(df_filtered1) < 2:
+            continue
+        x = df_filtered1['DURADJMOD'].values
+        y = df_filtered1['OAS_BP'].values
+        params, y_fit = fit_ns_curve(x, y)
+        if params is not None:
+            out[ticker] = (params, float(np.sum((y - y_fit) ** 2)))
+    return out
+
+
+def ig_universe_signals(df_bonds, deviation_threshold=5):
+    """The IG "Entire Universe Trade" loop, given precomputed NS_FIT/Deviation."""
+    trade_signals_tot = []
+    for ticker in df_bonds['TICKER'].unique():
+        df_filtered1 = df_bonds[df_bonds['TICKER'] == ticker]
+        if len(df_filtered1) < 2:
+            continue
+        df_below_owned1 = df_filtered1[
+            (df_filtered1['Own?'] == 'Y') &
+            (df_filtered1['Deviation'] < -deviation_threshold / 100 * df_filtered1['NS_FIT'])
+        ].copy()
+        df_above_unowned1 = df_filtered1[
+            (df_filtered1['Own?'] == 'N') &
+            (df_filtered1['Deviation'] > deviation_threshold / 100 * df_filtered1['NS_FIT'])
+        ].copy()
+        for _, row_below in df_below_owned1.iterrows():
+            for _, row_above in df_above_unowned1.iterrows():
+                if row_above['DURADJMOD'] > row_below['DURADJMOD']:
+                    ratio = (row_above['OAS_BP'] - row_below['OAS_BP']) / (row_above['DURADJMOD'] - row_below['DURADJMOD'])
+                    if ratio > 12:
+                        trade_signals_tot.append({
+                            "CRD_STRATEGY1": row_below['all_possible_strategies'],
+                            "Owned ID1": row_below['ID'],
+                            "Matched ID1": row_above['ID'],
+                            "Ratio OAS/Dur1": round(ratio, 2),
+                            "OAS Diff1": round(row_above['OAS_BP'] - row_below['OAS_BP'], 2),
+                            "Dur Diff1": round(row_above['DURADJMOD'] - row_below['DURADJMOD'], 2),
+                            "Deviation Owned1": round(row_below['Deviation'], 2),
+                            "Deviation Matched1": round(row_above['Deviation'], 2),
+                            "Dev Diff1": round(row_above['Deviation'] - row_below['Deviation'], 2)
+                        })
+        trade_signals_tot = sorted(trade_signals_tot, key=lambda x: (x['Owned ID1'], x['Ratio OAS/Dur1']), reverse=False)
+    return pd.DataFrame(trade_signals_tot)
+
+
+def hy_universe_signals(df_bonds):
+    """The "Overall HY Trade Universe" loop."""
+    trade_signals_tot = []
+    for ticker in df_bonds['TICKER'].unique():
+        df_filtered1 = df_bonds[df_bonds['TICKER'] == ticker]
+        if len(df_filtered1) < 2:
+            continue
+        df_below_owned1 = df_filtered1[(df_filtered1['Own?'] == 'Y')].copy()
+        for _, row_below in df_below_owned1.iterrows():
+            for _, row_above in df_filtered1.iterrows():
+                if row_above['DURADJMOD'] > row_below['DURADJMOD']:
+                    ratio = (row_above['OAS_BP'] - row_below['OAS_BP']) / (row_above['DURADJMOD'] - row_below['DURADJMOD'])
+                    if ratio > 20:
+                        trade_signals_tot.append({
+                            "Cusip": row_below['CUSIP'],
+                            "Owned": row_below['ID'],
+                            "Matched": row_above['ID'],
+                            "Cusip Matched": row_above['CUSIP'],
+                            "Ratio OAS/Dur1": round(ratio, 2),
+                            "OAS": round(row_above['OAS_BP'] - row_below['OAS_BP'], 2),
+                            "Dur": round(row_above['DURADJMOD'] - row_below['DURADJMOD'], 2),
+                        })
+        trade_signals_tot = sorted(trade_signals_tot, key=lambda x: (x['Owned'], x['Ratio OAS/Dur1']), reverse=False)
+    return pd.DataFrame(trade_signals_tot)
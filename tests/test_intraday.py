@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics.intraday import apply_updates
+from analytics.snapshot import build_snapshot
+from analytics.synthetic import oas_moves, universe
+
+
+def _wiped(raw, segment, snapshot):
+    """Updates that leave a ticker with pairs none: OAS falling with duration."""
+    index, bonds = getattr(snapshot, f'{segment}_pair_index'), getattr(snapshot, f'{segment}_universe')
+    ticker = bonds.take(index.owned[:1])['TICKER'].iloc[0]
+    rows = raw[segment][raw[segment]['TICKER'] == ticker]
+    return ticker, pd.DataFrame({'CUSIP': rows['CUSIP'], 'OAS_BP': 500.0 - 10 * rows['DURADJMOD'],
+                                 'DURADJMOD': np.nan})
+
+
+def _edited(raw, updates):
+    """``raw`` with ``updates`` written into the sources, as the next full load would see them."""
+    raw = {name: df.copy() for name, df in raw.items()}
+    by_cusip = updates.set_index('CUSIP')
+    for segment in ('ig', 'hy'):
+        df = raw[segment]
+        hit = df['CUSIP'].isin(by_cusip.index)
+        moved = by_cusip.loc[df.loc[hit, 'CUSIP']]
+        for col in ('OAS_BP', 'DURADJMOD'):
+            new = moved[col].to_numpy()
+            df.loc[hit, col] = np.where(np.isnan(new), df.loc[hit, col].to_numpy(dtype=np.float64), new)
+    return raw
+
+
+@pytest.fixture(scope='module')
+def snapshots():
+    raw = universe(3000, seed=3)
+    snapshot = build_snapshot(raw)
+    ig_ticker, ig_wipe = _wiped(raw, 'ig', snapshot)
+    hy_ticker, hy_wipe = _wiped(raw, 'hy', snapshot)
+    # A duration move that reorders its ticker's curve, on a bond with pairs.
+    moved = snapshot.ig_universe.take(snapshot.ig_pair_index.matched[-1:])
+    lengthened = pd.DataFrame({'CUSIP': moved['CUSIP'].astype(str), 'OAS_BP': np.nan,
+                               'DURADJMOD': moved['DURADJMOD'] + 3.0})
+    unknown = pd.DataFrame({'CUSIP': ['X99999999'], 'OAS_BP': [100.0], 'DURADJMOD': [np.nan]})
+    updates = pd.concat([oas_moves(raw['ig'], 30, seed=1), oas_moves(raw['hy'], 15, seed=2), ig_wipe, hy_wipe,
+                         lengthened, unknown], ignore_index=True)
+    updates = updates.drop_duplicates('CUSIP', keep='last').reset_index(drop=True)
+    patched, summary = apply_updates(snapshot, updates)
+    return {'original': snapshot, 'updates': updates, 'patched': patched, 'summary': summary,
+            'rebuilt': build_snapshot(_edited(raw, updates)), 'wiped': {'ig': ig_ticker, 'hy': hy_ticker}}
+
+
+def test_summary(snapshots):
+    summary, original = snapshots['summary'], snapshots['original']
+    cusips = snapshots['updates']['CUSIP']
+    known = (original.ig_universe.cusip_rows(cusips) >= 0) | (original.hy_universe.cusip_rows(cusips) >= 0)
+    assert summary['unmatched'] == (~known).sum() > 0
+    for segment in ('ig', 'hy'):
+        assert snapshots['wiped'][segment] in summary[segment]['tickers']
+
+
+def test_fits_match_rebuild(snapshots):
+    pd.testing.assert_frame_equal(snapshots['patched'].ig_fits, snapshots['rebuilt'].ig_fits)
+
+
+@pytest.mark.parametrize('segment', ['ig', 'hy'])
+def test_universe_matches_rebuild(snapshots, segment):
+    patched, rebuilt = (getattr(snapshots[k], f'{segment}_universe') for k in ('patched', 'rebuilt'))
+    rows = np.arange(len(rebuilt))
+    assert patched.tickers == rebuilt.tickers
+    pd.testing.assert_frame_equal(patched.bonds(rows), rebuilt.bonds(rows))
+
+
+@pytest.mark.parametrize('segment', ['ig', 'hy'])
+def test_wiped_ticker_has_no_pairs(snapshots, segment):
+    patched = snapshots['patched']
+    index, bonds = getattr(patched, f'{segment}_pair_index'), getattr(patched, f'{segment}_universe')
+    assert snapshots['wiped'][segment] not in set(bonds.take(index.owned)['TICKER'])
+
+
+@pytest.mark.parametrize('ratio_cutoff', [0, 5, 12, 30])
+@pytest.mark.parametrize('deviation_threshold', [0, 5, 15])
+@pytest.mark.parametrize('top_k', [None, 2])
+def test_ig_select_matches_rebuild(snapshots, ratio_cutoff, deviation_threshold, top_k):
+    patched, rebuilt = snapshots['patched'], snapshots['rebuilt']
+    pd.testing.assert_frame_equal(
+        patched.ig_pair_index.select(patched.ig_universe, ratio_cutoff, deviation_threshold, top_k),
+        rebuilt.ig_pair_index.select(rebuilt.ig_universe, ratio_cutoff, deviation_threshold, top_k))
+
+
+@pytest.mark.parametrize('ratio_cutoff', [0, 20, 40])
+@pytest.mark.parametrize('top_k', [None, 1])
+def test_hy_select_matches_rebuild(snapshots, ratio_cutoff, top_k):
+    patched, rebuilt = snapshots['patched'], snapshots['rebuilt']
+    pd.testing.assert_frame_equal(patched.hy_pair_index.select(patched.hy_universe, ratio_cutoff, top_k=top_k),
+                                  rebuilt.hy_pair_index.select(rebuilt.hy_universe, ratio_cutoff, top_k=top_k))
@@ -0,0 +1,57 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from analytics.loaders import SourceLoader, SQLiteBackend
+from analytics.sources import TableSpec
+
+BONDS = TableSpec('BONDS', ('CUSIP', 'OAS_BP'), key=('CUSIP',), as_of='UPDATED')
+
+
+def _write(path, rows):
+    with sqlite3.connect(path) as conn:
+        pd.DataFrame(rows, columns=['CUSIP', 'OAS_BP', 'UPDATED']).to_sql('BONDS', conn, index=False,
+                                                                        if_exists='replace')
+
+
+def _oas(frame):
+    return frame.set_index('CUSIP')['OAS_BP'].to_dict()
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / 'sources.db')
+    _write(path, [('A', 100.0, '2026-01-01'), ('B', 200.0, '2026-01-01')])
+    return path
+
+
+def test_as_of_requires_key():
+    with pytest.raises(ValueError):
+        TableSpec('POSITIONS', ('CUSIP', 'SHARE_PAR_VALUE'), as_of='UPDATED')
+
+
+def test_cached_until_ttl_expires(db):
+    loader = SourceLoader(SQLiteBackend(db), {'bonds': BONDS}, ttl=3600)
+    first = loader.load()['bonds']
+    _write(db, [('A', 150.0, '2026-01-02')])
+    assert loader.load()['bonds'] is first
+    assert _oas(loader.load(force=True)['bonds']) == {'A': 150.0}
+
+
+def test_incremental_refresh_upserts_newer_rows(db):
+    loader = SourceLoader(SQLiteBackend(db), {'bonds': BONDS}, ttl=0)
+    loader.load()
+    _write(db, [('A', 110.0, '2026-01-02'), ('B', 999.0, '2026-01-01'), ('C', 300.0, '2026-01-02')])
+    # B's row is not newer than the watermark, so its cached value stays.
+    assert _oas(loader.load()['bonds']) == {'A': 110.0, 'B': 200.0, 'C': 300.0}
+
+
+def test_full_reload_drops_removed_rows(db):
+    loader = SourceLoader(SQLiteBackend(db), {'bonds': BONDS}, ttl=0, full_reload_every=3)
+    loader.load()
+    _write(db, [('A', 100.0, '2026-01-01')])
+    assert set(loader.load()['bonds']['CUSIP']) == {'A', 'B'}
+    assert set(loader.load()['bonds']['CUSIP']) == {'A', 'B'}
+    # The third refresh after a full load is a full reload.
+    assert set(loader.load()['bonds']['CUSIP']) == {'A'}
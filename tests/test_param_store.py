@@ -0,0 +1,40 @@
+from datetime import date, timedelta
+
+import numpy as np
+
+from analytics.param_store import OAS_TOLERANCE, ParamStore, incremental_fit
+from analytics.processing import IG_MIN_BONDS_PER_TICKER, prepare_bonds
+from analytics.synthetic import universe
+
+
+def _bonds():
+    return prepare_bonds(universe(2000, seed=4)['ig'], IG_MIN_BONDS_PER_TICKER)
+
+
+def _fit(bonds, store, day, shift=0.0):
+    as_of = (date(2026, 1, 1) + timedelta(days=day)).isoformat()
+    return incremental_fit(bonds['TICKER'], bonds['DURADJMOD'], bonds['OAS_BP'] + shift, store, 'ig', as_of)
+
+
+def test_unchanged_inputs_are_reused(tmp_path):
+    bonds, store = _bonds(), ParamStore(str(tmp_path / 'params.db'))
+    first = _fit(bonds, store, 0)
+    second = _fit(bonds, store, 1)
+    assert (first['source'] == 'cold').all()
+    assert (second['source'] == 'reused').all()
+    np.testing.assert_array_equal(second['beta0'].to_numpy(), first['beta0'].to_numpy())
+
+
+def test_sub_tolerance_drift_does_not_accumulate(tmp_path):
+    bonds, store = _bonds(), ParamStore(str(tmp_path / 'params.db'))
+    step = 0.2
+    assert step < OAS_TOLERANCE
+    first = _fit(bonds, store, 0)
+    sources = [_fit(bonds, store, day, shift=step * day)['source'] for day in range(1, 29)]
+    # Day one is within tolerance of the fit; by day two the drift since the fit exceeds it.
+    assert (sources[0] == 'reused').all()
+    assert (sources[1] == 'warm').all()
+    last = _fit(bonds, store, 29, shift=step * 29)
+    assert not np.allclose(last['beta0'].to_numpy(), first['beta0'].to_numpy())
+    # Every refit resets the reference, so no ticker goes more than one day unrefit.
+    assert not any((s == 'reused').all() and (t == 'reused').all() for s, t in zip(sources, sources[1:]))
@@ -0,0 +1,72 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics.peers import PeerHistory
+
+WINDOW = 3
+
+
+def _days(n_days=7, n_bonds=300, seed=0):
+    rng = np.random.default_rng(seed)
+    cusips = np.array([f"C{i:05d}" for i in range(n_bonds)])
+    days = []
+    for d in range(n_days):
+        present = rng.random(n_bonds) < 0.85
+        bonds = pd.DataFrame({'CUSIP': cusips[present], 'OAS_BP': rng.normal(150, 20, present.sum()),
+                              'Deviation': rng.normal(0, 4, present.sum())})
+        bonds.loc[rng.random(len(bonds)) < 0.05, 'OAS_BP'] = np.nan
+        bonds.loc[rng.random(len(bonds)) < 0.1, 'Deviation'] = np.nan
+        days.append(((date(2026, 1, 1) + timedelta(days=d)).isoformat(), bonds))
+    return days
+
+
+def _direct(days):
+    """Rolling statistics recomputed from the raw days."""
+    g = pd.concat([bonds for _, bonds in days]).groupby('CUSIP')
+    return pd.DataFrame({'OAS_DAYS': g['OAS_BP'].count(), 'OAS_MEAN': g['OAS_BP'].mean(),
+                         'OAS_STD': g['OAS_BP'].std(), 'DEV_DAYS': g['Deviation'].count(),
+                         'DEV_MEAN': g['Deviation'].mean(), 'DEV_STD': g['Deviation'].std()})
+
+
+def _assert_matches(stats, days):
+    expected = _direct(days)
+    assert expected.index.difference(stats.index).empty
+    expected = expected.reindex(stats.index)
+    for col in expected:
+        values = expected[col].fillna(0) if col.endswith('_DAYS') else expected[col]
+        np.testing.assert_allclose(stats[col].to_numpy(dtype=np.float64), values.to_numpy(dtype=np.float64),
+                                   rtol=1e-12, atol=1e-9, err_msg=col)
+
+
+@pytest.fixture
+def history(tmp_path):
+    return PeerHistory(str(tmp_path / 'peers.db'), window=WINDOW)
+
+
+def test_rolling_stats_match_window(history):
+    days = _days()
+    for i, (as_of, bonds) in enumerate(days):
+        assert history.add_day('ig', as_of, bonds)
+        _assert_matches(history.stats('ig'), days[max(0, i + 1 - WINDOW):i + 1])
+
+
+def test_stats_before_leave_out_later_days(history):
+    days = _days()
+    for as_of, bonds in days:
+        history.add_day('ig', as_of, bonds)
+    window = days[-WINDOW:]
+    _assert_matches(history.stats('ig', before=days[-1][0]), window[:-1])
+    _assert_matches(history.stats('ig', before=days[-2][0]), window[:-2])
+    _assert_matches(history.stats('ig', before='2027-01-01'), window)
+
+
+def test_days_are_added_once_and_in_order(history):
+    (first, bonds), (second, _) = _days(2)
+    assert history.add_day('hy', second, bonds)
+    assert not history.add_day('hy', second, bonds)
+    with pytest.raises(ValueError):
+        history.add_day('hy', first, bonds)
+    assert history.days('hy') == [second]
@@ -0,0 +1,35 @@
+import pandas as pd
+import pytest
+
+from analytics.ownership import build_ownership_index
+from analytics.processing import build_hy, build_ig
+from analytics.signals import hy_pair_index, hy_universe_tables, ig_pair_index, ig_universe_tables
+from analytics.synthetic import universe
+from analytics.universe import BondUniverse
+
+
+@pytest.fixture(scope='module')
+def bonds():
+    raw = universe(3000, seed=2)
+    ownership = build_ownership_index(raw['positions'])
+    ig, _, _ = build_ig(raw['ig'], ownership, universe_signals=False)
+    hy, _ = build_hy(raw['hy'], ownership, universe_signals=False)
+    return {'ig': ig, 'hy': hy}
+
+
+@pytest.mark.parametrize('ratio_cutoff, deviation_threshold, top_k', [
+    (12, 5, None), (0, 0, None), (0, 20, None), (6.5, 2.5, 3), (12, 5, 1), (500, 5, None),
+])
+def test_ig_select_equals_rescan(bonds, ratio_cutoff, deviation_threshold, top_k):
+    df = bonds['ig']
+    selected = ig_pair_index(df).select(BondUniverse(df), ratio_cutoff, deviation_threshold, top_k)
+    expected = pd.concat(ig_universe_tables(df, deviation_threshold, ratio_cutoff, top_k), ignore_index=True)
+    pd.testing.assert_frame_equal(selected, expected)
+
+
+@pytest.mark.parametrize('ratio_cutoff, top_k', [(20, None), (0, None), (35.5, 2), (20, 1), (1000, None)])
+def test_hy_select_equals_rescan(bonds, ratio_cutoff, top_k):
+    df = bonds['hy']
+    selected = hy_pair_index(df).select(BondUniverse(df), ratio_cutoff, top_k=top_k)
+    expected = pd.concat(hy_universe_tables(df, ratio_cutoff, top_k), ignore_index=True)
+    pd.testing.assert_frame_equal(selected, expected)
@@ -0,0 +1,14 @@
+from analytics.snapshot import OwnershipCache, build_snapshot
+from analytics.synthetic import universe
+
+
+def test_segment_snapshots_share_one_ownership_index():
+    raw = universe(500, seed=1)
+    cache = OwnershipCache()
+    build_snapshot(raw, segments=('ig',), ownership_cache=cache)
+    index = cache.get(raw['positions'])
+    build_snapshot({**raw, 'positions': raw['positions'].copy()}, segments=('hy',), ownership_cache=cache)
+    assert cache.get(raw['positions']) is index
+    moved = raw['positions'].copy()
+    moved.loc[0, 'SHARE_PAR_VALUE'] += 1
+    assert cache.get(moved) is not index